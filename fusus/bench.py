@@ -0,0 +1,764 @@
+"""Benchmarks of the pipeline and the conversions.
+
+We time the main operations of *fusus* over fixed sets of pages of the books
+that are bundled in this repo, so that we can tell whether a change in the code,
+or an upgrade of a dependency, has made things faster or slower.
+
+## Usage
+
+``` sh
+python3 -m fusus.bench run
+python3 -m fusus.bench compare benchmarks/bench-20210301-120000.json
+```
+
+See `HELP` for all options.
+
+## What is measured
+
+**pipeline** (`benchPipeline`)
+
+The OCR pipeline over the page sets in `PIPELINE`, i.e. a few pages of
+the `example` book and of the Affifi edition in `ur/Affifi`.
+The pages are copied to a temporary directory first, so the outputs
+in the repo are not touched.
+The steps of each page are measured by the profiler (`fusus.profiler`),
+and we report every step separately, summed over the pages.
+OCR is only done when asked for, and only if the Kraken model is present.
+
+**synthetic** (`benchSynthetic`)
+
+The pipeline over a book of synthetic pages, generated by `fusus.synth`,
+with as many pages as you like.
+Besides the timings, we compare the layout and the cleaning with the ground truth
+of the synthetic pages.
+
+**conversions** (`benchConversions`)
+
+*   `fusus.lakhnawi.Lakhnawi.getPages` over the pages `LAKHNAWI_PAGES`;
+    skipped if the Lakhnawi PDF is not present;
+*   `fusus.convert.loadTsv` over the bundled TSV files of the known works;
+*   `fusus.tfFromTsv.convert` of those TSV files to a throw-away TF version
+    `BENCH_TF_VERSION`, which is removed afterwards.
+
+**micro** (`fusus.microbench.benchMicro`)
+
+The helper functions that are called thousands of times per book,
+measured in isolation on inputs captured from real pages.
+
+## Results
+
+Every benchmark is run a number of times; we record all wall times and CPU times,
+and report the median and the minimum.
+
+The results go into a JSON file in the directory `BENCH_DIR`,
+together with information on the machine and the versions of
+the main dependencies.
+
+The compare command compares two result files, benchmark by benchmark,
+and flags the benchmarks that have become slower by more than
+a given tolerance as regressions.
+Timings are only comparable if they come from the same machine:
+when the machine information differs, the comparison says so.
+"""
+
+import sys
+import os
+import io
+import json
+import time
+import shutil
+import platform
+import statistics
+import subprocess
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime
+
+from tf.core.helpers import unexpanduser
+
+from .parameters import REPO_DIR, UR_DIR, KRAKEN
+from .lib import imageFileList, select, splitext
+from .profiler import readProfile, summarize
+from .works import WORKS, getFile, getTfDest
+
+
+__pdoc__ = {}
+
+HELP = """
+Run benchmarks and compare the results of benchmark runs.
+
+python3 -m fusus.bench --help
+python3 -m fusus.bench run [ocr] [repeat=n] [only=group,...] [synth=n] [out=file]
+python3 -m fusus.bench compare old [new] [tolerance=t]
+
+--help: print this text and exit
+
+run         : run the benchmarks and save the results
+ocr         : include OCR in the pipeline benchmarks; default: no OCR
+repeat      : how many times each benchmark is run; default: 3
+only        : run only these groups of benchmarks:
+              pipeline, synthetic, conversions, micro; default: all groups
+synth       : the number of pages of the synthetic book; default: 20
+out         : where the results go;
+              default: a timestamped file in the benchmarks directory
+
+compare     : compare the results of two runs
+old         : the results of the baseline run
+new         : the results of the run to compare with the baseline;
+              default: the most recent results in the benchmarks directory
+tolerance   : how much slower (as a fraction) a benchmark may become before
+              it counts as a regression; default: 0.1
+"""
+"""Help"""
+
+__pdoc__["HELP"] = f"``` text\n{HELP}\n```"
+
+BENCH_DIR = f"{REPO_DIR}/benchmarks"
+"""Default directory for benchmark results."""
+
+BENCH_PREFIX = "bench-"
+
+PIPELINE = dict(
+    example=dict(dir=f"{REPO_DIR}/example", pages="47-48,58-59,101-102"),
+    affifi=dict(dir=f"{UR_DIR}/Affifi", pages="50-54"),
+)
+"""The books and pages over which we run the pipeline."""
+
+LAKHNAWI_PAGES = "100-110"
+"""The pages of the Lakhnawi PDF that we extract."""
+
+BENCH_TF_VERSION = "0.0bench"
+"""The TF version that receives the throw-away TF of the conversion benchmarks."""
+
+SYNTH_PAGES = 20
+"""The number of pages of the synthetic book."""
+
+SYNTH_SEED = 1
+"""The seed for the synthetic book."""
+
+GROUPS = ("pipeline", "synthetic", "conversions", "micro")
+
+REPEAT = 3
+
+TOLERANCE = 0.1
+
+MIN_DIFF = 0.005
+"""Differences below this amount of seconds never count as regressions."""
+
+PACKAGES = dict(
+    numpy=("numpy",),
+    opencv=(
+        "opencv-contrib-python",
+        "opencv-contrib-python-headless",
+        "opencv-python",
+        "opencv-python-headless",
+    ),
+    scipy=("scipy",),
+    pillow=("Pillow",),
+    pymupdf=("PyMuPDF",),
+    kraken=("kraken",),
+    textfabric=("text-fabric",),
+    fusus=("fusus",),
+)
+"""The software whose versions we record, with the distributions that provide it."""
+
+
+def machineInfo():
+    """Information about the machine and the software of a benchmark run.
+
+    Returns
+    -------
+    dict
+    """
+
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        version = None
+
+    versions = {}
+    for (package, distributions) in PACKAGES.items():
+        versions[package] = None
+        if version is None:
+            continue
+        for distribution in distributions:
+            try:
+                versions[package] = version(distribution)
+                break
+            except PackageNotFoundError:
+                pass
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except Exception:
+        commit = None
+
+    return dict(
+        date=datetime.now().isoformat(timespec="seconds"),
+        platform=platform.platform(),
+        machine=platform.machine(),
+        processor=platform.processor(),
+        cpus=os.cpu_count(),
+        python=platform.python_version(),
+        versions=versions,
+        commit=commit or None,
+    )
+
+
+def durRep(seconds):
+    """Represents a duration in a fixed width with a suitable unit."""
+
+    if seconds >= 1:
+        return f"{seconds:>8.3f}s"
+    if seconds >= 0.001:
+        return f"{seconds * 1000:>7.2f}ms"
+    return f"{seconds * 1000000:>7.1f}µs"
+
+
+def timeIt(func, repeat):
+    """Runs a function several times and measures it.
+
+    Parameters
+    ----------
+    func: function
+        Called without arguments.
+    repeat: int
+        The number of runs.
+
+    Returns
+    -------
+    list of tuple
+        Per run the wall time and the CPU time of the process.
+    """
+
+    runs = []
+    for i in range(repeat):
+        startCpu = time.process_time()
+        start = time.perf_counter()
+        func()
+        runs.append((time.perf_counter() - start, time.process_time() - startCpu))
+    return runs
+
+
+def resultFromRuns(runs, **extra):
+    """Condenses the measurements of a benchmark.
+
+    Parameters
+    ----------
+    runs: list of tuple
+        Per run the wall time and the CPU time.
+    extra: dict, optional
+        Additional information to store with the result.
+
+    Returns
+    -------
+    dict
+    """
+
+    walls = [w for (w, c) in runs]
+    cpus = [c for (w, c) in runs]
+    return dict(
+        wall=round(statistics.median(walls), 6),
+        minWall=round(min(walls), 6),
+        cpu=round(statistics.median(cpus), 6),
+        walls=[round(w, 6) for w in walls],
+        cpus=[round(c, 6) for c in cpus],
+        **extra,
+    )
+
+
+def benchPipeline(results, repeat=REPEAT, ocr=False):
+    """Times the steps of the pipeline over the bundled books.
+
+    Parameters
+    ----------
+    results: dict
+        The results are added to this dict, keyed by benchmark name.
+    repeat: int, optional `REPEAT`
+        The number of runs per book.
+    ocr: boolean, optional `False`
+        Whether to include OCR.
+    """
+
+    from .book import Book
+
+    if ocr and not os.path.exists(KRAKEN["modelPath"]):
+        print(f"No OCR: model not found: {unexpanduser(KRAKEN['modelPath'])}")
+        ocr = False
+
+    cwd = os.getcwd()
+
+    for (name, info) in PIPELINE.items():
+        srcDir = info["dir"]
+        inDir = f"{srcDir}/in"
+        if not os.path.exists(inDir):
+            print(f"pipeline/{name}: skipped: no page images in {unexpanduser(inDir)}")
+            continue
+
+        pageFiles = select(imageFileList(inDir), info["pages"])
+        workDir = tempfile.mkdtemp(prefix=f"fusus-bench-{name}-")
+
+        try:
+            copyBook(srcDir, pageFiles, workDir)
+            print(f"pipeline/{name}: {len(pageFiles)} pages x {repeat}")
+            with redirect_stdout(io.StringIO()):
+                B = Book(cd=workDir)
+            timeBook(B, f"pipeline/{name}", results, repeat, ocr)
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workDir, ignore_errors=True)
+
+
+def copyBook(srcDir, pageFiles, workDir):
+    """Copies pages and marks of a book to a working directory.
+
+    Parameters
+    ----------
+    srcDir: string
+        The directory of the book.
+    pageFiles: iterable of string
+        The file names of the pages to copy.
+    workDir: string
+        The directory to copy to.
+    """
+
+    inDir = f"{srcDir}/in"
+    os.makedirs(f"{workDir}/in", exist_ok=True)
+    for f in pageFiles:
+        shutil.copy(f"{inDir}/{f}", f"{workDir}/in/{f}")
+    if os.path.exists(f"{srcDir}/marks"):
+        shutil.copytree(f"{srcDir}/marks", f"{workDir}/marks")
+
+
+def timeBook(B, key, results, repeat, ocr):
+    """Processes all pages of a book repeatedly and measures the steps.
+
+    Parameters
+    ----------
+    B: object
+        A `fusus.book.Book`.
+    key: string
+        The name of the benchmark. The steps are stored under this name,
+        followed by a `/` and the name of the step.
+    results: dict
+        The results are added to this dict, keyed by benchmark name.
+    repeat: int
+        The number of runs.
+    ocr: boolean
+        Whether to include OCR.
+    """
+
+    stepRuns = {}
+    stepCalls = {}
+    stepCounters = {}
+    totalRuns = []
+
+    for i in range(repeat):
+        startCpu = time.process_time()
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            B.process(doOcr=ocr, profile=True)
+        totalRuns.append((time.perf_counter() - start, time.process_time() - startCpu))
+        for (stage, calls, wall, cpu, rss, counters) in summarize(
+            readProfile(B.profiler.path)
+        ):
+            stepRuns.setdefault(stage, []).append((wall, cpu))
+            stepCalls[stage] = calls
+            stepCounters[stage] = counters
+
+    nPages = len(B.allPages)
+    results[key] = resultFromRuns(totalRuns, pages=nPages)
+    results[key]["pagesPerSecond"] = round(nPages / results[key]["wall"], 3)
+    for (stage, runs) in stepRuns.items():
+        results[f"{key}/{stage}"] = resultFromRuns(
+            runs, calls=stepCalls[stage], counters=stepCounters[stage]
+        )
+
+
+def benchSynthetic(results, repeat=REPEAT, pages=SYNTH_PAGES):
+    """Times the pipeline over a synthetic book and measures its accuracy.
+
+    The book is generated by `fusus.synth.makeBook` in a temporary directory.
+    After timing, every page is processed once more (without writing results)
+    and compared with the ground truth by `fusus.synth.evaluate`.
+    The totals of that comparison are stored with the benchmark
+    under the key `accuracy`.
+
+    Parameters
+    ----------
+    results: dict
+        The results are added to this dict, keyed by benchmark name.
+    repeat: int, optional `REPEAT`
+        The number of runs.
+    pages: int, optional `SYNTH_PAGES`
+        The number of pages of the synthetic book.
+    """
+
+    from .book import Book
+    from .synth import makeBook, readTruth, evaluate
+
+    cwd = os.getcwd()
+    workDir = tempfile.mkdtemp(prefix="fusus-bench-synthetic-")
+    key = "synthetic"
+
+    try:
+        print(f"{key}: {pages} pages x {repeat}")
+        makeBook(workDir, pages=pages, seed=SYNTH_SEED)
+        with redirect_stdout(io.StringIO()):
+            B = Book(cd=workDir)
+        timeBook(B, key, results, repeat, False)
+
+        accuracy = {}
+        for f in B.allPages:
+            with redirect_stdout(io.StringIO()):
+                page = B._doPage(f, batch=True, quiet=True, doOcr=False)
+            for (k, n) in evaluate(page, readTruth(workDir, splitext(f)[0])).items():
+                accuracy[k] = accuracy.get(k, 0) + n
+        results[key]["accuracy"] = accuracy
+        print(
+            f"{key}: blocks {accuracy['blocksMatched']}/{accuracy['blocks']}"
+            f" lines {accuracy['linesMatched']}/{accuracy['lines']}"
+            f" marks wiped {accuracy['marksWiped']}/{accuracy['marks']}"
+        )
+        if accuracy["marksInBlocks"] and not accuracy["marksWiped"]:
+            print(
+                f"{key}: WARNING: none of the {accuracy['marksInBlocks']} marks"
+                " inside the blocks has been wiped: the cleaning does not work"
+            )
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workDir, ignore_errors=True)
+
+
+def benchConversions(results, repeat=REPEAT):
+    """Times the text extraction of the Lakhnawi PDF and the TSV conversions.
+
+    Parameters
+    ----------
+    results: dict
+        The results are added to this dict, keyed by benchmark name.
+    repeat: int, optional `REPEAT`
+        The number of runs per benchmark.
+    """
+
+    from .lakhnawi import SOURCE, Lakhnawi
+    from .convert import loadTsv
+    from .tfFromTsv import convert
+
+    key = "conversions/lakhnawi.getPages"
+    if os.path.exists(SOURCE):
+        print(f"{key}: pages {LAKHNAWI_PAGES} x {repeat}")
+        with redirect_stdout(io.StringIO()):
+            Lw = Lakhnawi()
+            runs = timeIt(lambda: Lw.getPages(LAKHNAWI_PAGES), repeat)
+            Lw.close()
+        results[key] = resultFromRuns(runs)
+    else:
+        print(f"{key}: skipped: no PDF at {unexpanduser(SOURCE)}")
+
+    for work in WORKS:
+        with redirect_stdout(io.StringIO()):
+            (sourceFile, ocred) = getFile(work, None)
+        if sourceFile is None or not os.path.exists(sourceFile):
+            print(f"conversions/{work}: skipped: no TSV file")
+            continue
+
+        key = f"conversions/convert.loadTsv/{work}"
+        print(f"{key}: x {repeat}")
+        with redirect_stdout(io.StringIO()):
+            runs = timeIt(lambda: loadTsv(source=work), repeat)
+        results[key] = resultFromRuns(runs)
+
+        key = f"conversions/tfFromTsv.convert/{work}"
+        print(f"{key}: x {repeat}")
+        with redirect_stdout(io.StringIO()):
+            dest = getTfDest(work, BENCH_TF_VERSION)
+        try:
+            with redirect_stdout(io.StringIO()):
+                runs = timeIt(
+                    lambda: convert(work, None, None, BENCH_TF_VERSION), repeat
+                )
+            results[key] = resultFromRuns(runs)
+        finally:
+            if dest is not None:
+                shutil.rmtree(dest, ignore_errors=True)
+
+
+def run(ocr=False, repeat=REPEAT, only=None, out=None, synth=SYNTH_PAGES):
+    """Runs the benchmarks and saves the results.
+
+    Parameters
+    ----------
+    ocr: boolean, optional `False`
+        Whether to include OCR in the pipeline benchmarks.
+    repeat: int, optional `REPEAT`
+        The number of runs per benchmark.
+    only: iterable of string, optional `None`
+        If given, only these groups of benchmarks are run, see `GROUPS`.
+    out: string, optional `None`
+        The file to write the results to.
+        If `None`, a timestamped file in `BENCH_DIR` is taken.
+    synth: int, optional `SYNTH_PAGES`
+        The number of pages of the synthetic book.
+
+    Returns
+    -------
+    string
+        The path of the results file.
+    """
+
+    groups = GROUPS if only is None else tuple(g for g in GROUPS if g in only)
+
+    if out is None:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        out = f"{BENCH_DIR}/{BENCH_PREFIX}{stamp}.json"
+
+    results = {}
+
+    for group in groups:
+        if group == "pipeline":
+            benchPipeline(results, repeat=repeat, ocr=ocr)
+        elif group == "synthetic":
+            benchSynthetic(results, repeat=repeat, pages=synth)
+        elif group == "conversions":
+            benchConversions(results, repeat=repeat)
+        elif group == "micro":
+            from .microbench import benchMicro
+
+            benchMicro(results, repeat=repeat)
+
+    outDir = os.path.dirname(out)
+    if outDir and not os.path.exists(outDir):
+        os.makedirs(outDir, exist_ok=True)
+
+    with open(out, "w") as fh:
+        json.dump(
+            dict(
+                meta=machineInfo(),
+                settings=dict(ocr=ocr, repeat=repeat, groups=groups, synth=synth),
+                results=results,
+            ),
+            fh,
+            ensure_ascii=False,
+            indent=1,
+        )
+
+    for (name, result) in results.items():
+        print(f"{name:<56} {durRep(result['wall'])}")
+    print(f"Results in {unexpanduser(out)}")
+    return out
+
+
+def latest():
+    """The most recent results file in `BENCH_DIR`, or `None`."""
+
+    if not os.path.exists(BENCH_DIR):
+        return None
+    files = sorted(
+        f
+        for f in os.listdir(BENCH_DIR)
+        if f.startswith(BENCH_PREFIX) and f.endswith(".json")
+    )
+    return f"{BENCH_DIR}/{files[-1]}" if files else None
+
+
+def compare(old, new=None, tolerance=TOLERANCE):
+    """Compares the results of two benchmark runs.
+
+    We compare the median wall times.
+    A benchmark that has become slower by more than a fraction `tolerance`
+    (and by more than `MIN_DIFF` seconds) is a regression.
+
+    Parameters
+    ----------
+    old: string
+        The results file of the baseline run.
+    new: string, optional `None`
+        The results file to compare with the baseline.
+        If `None`, the most recent results file in `BENCH_DIR` is taken.
+    tolerance: float, optional `TOLERANCE`
+        The allowed slow down, as a fraction.
+
+    Returns
+    -------
+    boolean
+        Whether there are no regressions.
+    """
+
+    if new is None:
+        new = latest()
+        if new is None:
+            print(f"No benchmark results in {unexpanduser(BENCH_DIR)}")
+            return False
+
+    with open(old) as fh:
+        oldData = json.load(fh)
+    with open(new) as fh:
+        newData = json.load(fh)
+
+    print(f"old: {unexpanduser(old)}")
+    print(f"new: {unexpanduser(new)}")
+
+    oldMeta = oldData["meta"]
+    newMeta = newData["meta"]
+    for k in ("platform", "machine", "processor", "cpus"):
+        if oldMeta.get(k) != newMeta.get(k):
+            print(f"Different {k}: {oldMeta.get(k)} versus {newMeta.get(k)}")
+    for (package, v) in newMeta["versions"].items():
+        vOld = oldMeta["versions"].get(package, None)
+        if vOld != v:
+            print(f"{package}: {vOld} => {v}")
+
+    oldResults = oldData["results"]
+    newResults = newData["results"]
+
+    regressions = []
+
+    print(f"{'benchmark':<56} {'old':>9} {'new':>9} {'ratio':>6}")
+    for (name, newResult) in newResults.items():
+        oldResult = oldResults.get(name, None)
+        if oldResult is None:
+            print(f"{name:<56} {'':>9} {durRep(newResult['wall'])}   new")
+            continue
+        oldWall = oldResult["wall"]
+        newWall = newResult["wall"]
+        ratio = newWall / oldWall if oldWall else 1
+        verdict = ""
+        # micro benchmarks measure the time of a single operation
+        isMicro = "opsPerSecond" in newResult
+        if isMicro or abs(newWall - oldWall) > MIN_DIFF:
+            if ratio > 1 + tolerance:
+                verdict = "REGRESSION"
+                regressions.append(name)
+            elif ratio < 1 - tolerance:
+                verdict = "faster"
+        print(
+            f"{name:<56} {durRep(oldWall)} {durRep(newWall)} {ratio:>6.2f} {verdict}"
+        )
+
+    for name in oldResults:
+        if name not in newResults:
+            print(f"{name:<56} {durRep(oldResults[name]['wall'])} {'':>9}   gone")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {tolerance:.0%}")
+    else:
+        print(f"No regressions beyond {tolerance:.0%}")
+
+    return not regressions
+
+
+# MAIN
+
+
+def parseArgs(args):
+    """Parse arguments from the command line.
+
+    Performs sanity checks.
+
+    Parameters
+    ----------
+    args: list
+        All command line arguments.
+        The full command is stripped from what `sys.argv` yields.
+
+    Returns
+    -------
+    passed: dict
+        The interpreted values of the command line arguments,
+        which will be passed on to the rest of program.
+    """
+
+    passed = dict(
+        command=None,
+        files=[],
+        ocr=False,
+        repeat=REPEAT,
+        only=None,
+        out=None,
+        synth=SYNTH_PAGES,
+        tolerance=TOLERANCE,
+    )
+    good = True
+
+    for arg in args:
+        if arg in {"run", "compare"}:
+            if passed["command"] is None:
+                passed["command"] = arg
+            else:
+                print(f"Repeated command: `{arg}`")
+                good = False
+        elif arg == "ocr":
+            passed["ocr"] = True
+        elif arg == "--help":
+            print(HELP)
+            good = None
+        elif "=" in arg:
+            (k, v) = arg.split("=", 1)
+            if k in {"repeat", "synth", "tolerance"}:
+                try:
+                    passed[k] = float(v) if k == "tolerance" else int(v)
+                except ValueError:
+                    print(f"Not a number: `{v}` for {k}")
+                    good = False
+            elif k == "only":
+                passed[k] = v.split(",")
+                for g in passed[k]:
+                    if g not in GROUPS:
+                        print(f"Unknown group `{g}`; choose from {', '.join(GROUPS)}")
+                        good = False
+            elif k == "out":
+                passed[k] = v
+            else:
+                print(f"Unknown option `{k}`")
+                good = False
+        else:
+            passed["files"].append(arg)
+
+    if good:
+        command = passed["command"]
+        nFiles = len(passed["files"])
+        if command is None:
+            print("No command specified (run or compare)")
+            good = False
+        elif command == "run" and nFiles:
+            print(f"Illegal argument(s) for run: {' '.join(passed['files'])}")
+            good = False
+        elif command == "compare" and not 1 <= nFiles <= 2:
+            print("Specify one or two result files to compare")
+            good = False
+
+    return (good, passed)
+
+
+def main():
+    """Perform tasks.
+
+    See `HELP`.
+    """
+
+    args = () if len(sys.argv) == 1 else tuple(sys.argv[1:])
+    (good, passed) = parseArgs(args)
+    if not good:
+        return good is None
+
+    if passed["command"] == "run":
+        run(
+            ocr=passed["ocr"],
+            repeat=passed["repeat"],
+            only=passed["only"],
+            out=passed["out"],
+            synth=passed["synth"],
+        )
+        return True
+    elif passed["command"] == "compare":
+        return compare(*passed["files"], tolerance=passed["tolerance"])
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
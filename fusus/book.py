@@ -62,6 +62,16 @@ After running the pipeline, the following subdirectories may have been produced:
 *   `inter`
     Intermediate files, such as page images with histograms displayed in it,
     or data files with information on the marks that have been encountered and wiped;
+    the file `manifest.json` records for each page the outcome of the last
+    run in which it was processed, see `Book.manifest`;
+    the OCR data of each page is also stored here in binary form,
+    in `.npy` and `.json` files, which are read faster than the tab separated
+    files, see `fusus.page.writeColumns`, unless the output profile
+    leaves them out, see `fusus.parameters.OUTPUT_PROFILES`;
+    if the setting `database` is on, the OCR data of all pages is also
+    collected in the database `ocr.sqlite`, see `fusus.store`;
+    per page a summary of the confidences of the OCR results, from which
+    `Book.measureQuality` makes its report, see `fusus.ocr.qualitySummary`;
 *   `clean`
     Cleaned page block images, input for OCR processing.
 *   `out`
@@ -71,6 +81,8 @@ After running the pipeline, the following subdirectories may have been produced:
     Tab separated files with one row per character.
     Normalized input images. Overlay HTML files with OCR results,
     coloured by confidence, both on character basis and on word basis.
+    The overlay files only hold the OCR data of their page; the boxes are drawn
+    in the browser by the shared files `proof.js` and `proof.css`.
 *   `text`
     Plain HTML rendering of the full, recognized text with page and line
     indicators. Used for reading the results by human eyes.
@@ -89,19 +101,23 @@ After running the pipeline, the following subdirectories may have been produced:
 
 import sys
 import os
-import collections
+import json
+import heapq
+from itertools import chain
+from datetime import datetime
 
 import cv2
 
 from tf.core.timestamp import Timestamp
 from tf.core.helpers import unexpanduser
 
-from .parameters import Config, ALL_PAGES
+from .parameters import Config, ALL_PAGES, OUTPUT_PROFILES
 from .lib import (
     imageFileList,
     imageFileListSub,
     pagesRep,
     select,
+    isBlank,
     showImage,
     splitext,
     getNbPath,
@@ -109,8 +125,79 @@ from .lib import (
     dh,
 )
 from .clean import reborder
-from .page import Page
-from .ocr import OCR, showConf, getProofColor
+from .page import Page, readScan, HEADERS
+from .lines import pageLineHeight, linePrior
+from .ocr import OCR, showConf, getProofColor, WORST_EXAMPLES
+from .template import Template
+from .profiler import Profiler, PROFILE_PREFIX, PROFILE_EXT, readProfile, summarize
+from .workers import Writer, Prefetcher
+from .store import Store, STORE_FILE
+
+
+MANIFEST_FILE = "manifest.json"
+"""Name of the file in the `inter` directory with the status of each page."""
+
+TEXT_TEMPLATE = Template(
+    """\
+<html>
+  <head>
+  <meta charset="utf-8"/>
+<style>
+body {
+  font-size: x-large;
+  text-align: right;
+  direction: rtl;
+}
+div.page {
+  text-align: right;
+}
+div.stripe {
+  display: flex;
+  flex-flow: row nowrap;
+}
+div.c, div.cl, div.cr {
+  text-align: right;
+}
+h3 {
+  text-align: right;
+}
+span.ln {
+  font-style: italic;
+  font-size: small;
+  vertical-align: super;
+  text-align: right;
+}
+p.nav {
+  font-size: medium;
+  direction: ltr;
+  text-align: left;
+}
+</style>
+  </head>
+«body»
+</body>
+</html>
+"""
+)
+"""Template for the plain text rendering of the OCR results, see `Book.htmlPages`."""
+
+INDEX_TEMPLATE = Template(
+    """\
+<html>
+  <head>
+  <meta charset="utf-8"/>
+  <title>«title»</title>
+  </head>
+<body>
+<h1>«title»</h1>
+<ul>
+«body»
+</ul>
+</body>
+</html>
+"""
+)
+"""Template for the index of the volumes of the text, see `Book.htmlPages`."""
 
 
 class Book:
@@ -146,6 +233,11 @@ class Book:
         self.C = Config(tm, **params)
         self._applySettings()
         self.OCR = OCR(self)
+        self.profiler = Profiler()
+        self.writer = None
+        self.outputs = None
+        self.storing = False
+        self.linePrior = None
 
     def _applySettings(self):
         """After a settings update, recompute derived settings."""
@@ -312,6 +404,7 @@ class Book:
         quiet=False,
         doOcr=True,
         uptoLayout=False,
+        keep=None,
         **kwargs,
     ):
         """Process a single page.
@@ -336,6 +429,11 @@ class Book:
             Whether to perform OCR processing
         uptoLayout: boolean, optional `False`
             Whether to stop after doing layout
+        keep: iterable of string, optional `None`
+            If given, and in batch mode, image stages are released as soon as
+            the steps that consume them have run, except the stages in `keep`,
+            see `fusus.page.Page.release`.
+            Otherwise all stages are kept.
 
         Returns
         -------
@@ -357,30 +455,46 @@ class Book:
         indent(level=baseLevel, reset=True)
 
         bare = splitext(f)[0]
+        span = self.profiler.span
 
         if not batch:
             info(f"Processing {bare}")
 
-        page = Page(self, f, batch=batch, boxed=boxed, **kwargs)
+        keep = None if not batch or keep is None else set(keep)
+
+        def release(step):
+            if keep is not None:
+                page.release(step, keep=keep)
+
+        with span("read"):
+            page = Page(self, f, batch=batch, boxed=boxed, **kwargs)
         if batch or not page.empty:
             if not batch:
                 indent(level=subLevel, reset=True)
                 info("normalizing")
-            page.doNormalize()
+            with span("doNormalize"):
+                page.doNormalize()
+            release("doNormalize")
             if page.empty:
                 return page
 
             if not batch:
                 info("layout")
-            page.doLayout()
+            with span("doLayout"):
+                page.doLayout()
+            release("doLayout")
             if not uptoLayout:
                 if not batch:
                     info("cleaning")
-                page.cleaning(showKept=not batch or boxed)
+                with span("cleaning"):
+                    page.cleaning(showKept=not batch or boxed)
+                release("cleaning")
                 if not page.empty and doOcr:
                     if not batch:
                         info("ocr")
-                    page.ocring()
+                    with span("ocring"):
+                        page.ocring()
+                    release("ocring")
 
         tm.silentOff()
 
@@ -394,6 +508,9 @@ class Book:
         boxed=False,
         doOcr=True,
         uptoLayout=False,
+        profile=False,
+        trace=None,
+        output=None,
         **kwargs,
     ):
         """Process directory of images.
@@ -424,6 +541,48 @@ class Book:
             Whether to perform OCR processing
         uptoLayout: boolean, optional `False`
             Whether to stop after doing layout
+        profile: boolean, optional `False`
+            Whether to measure the processing steps of each page.
+            The measurements are written to a file `profile-`*timestamp*`.jsonl`
+            in the `inter` directory, see `fusus.profiler`.
+            Use `Book.profileReport` to see a summary.
+        trace: string, optional `None`
+            If given, a trace of the run is written to this file.
+            It shows the processing steps of each page on a time line, per thread,
+            including the mark matching per band and the recognition per line.
+            Open it in a trace viewer such as `chrome://tracing`,
+            Perfetto or speedscope, see `fusus.profiler`.
+        output: string, optional `None`
+            The output profile: which stages are written to disk,
+            see `fusus.parameters.OUTPUT_PROFILES`.
+            If `None`, the setting `outputProfile` is used.
+
+        Notes
+        -----
+        If the setting `blankCheck` is on, every page is first checked for
+        blankness on a reduced version of the scan, see `fusus.lib.isBlank`.
+        Blank pages are skipped, but their data files are written, empty,
+        so that the data files of the pages form a complete sequence.
+
+        The outcome per page is recorded in the manifest, see `Book.manifest`.
+
+        In batch mode the image stages of a page are released as soon as
+        the steps that need them have run, except the stages that are written
+        at the end, see `fusus.page.Page.release`.
+
+        If the setting `prefetch` is positive, the scans of the next pages
+        are read and decoded in background threads while the current page is
+        processed, see `fusus.workers.Prefetcher`.
+
+        If the setting `writeWorkers` is positive, the output files are written
+        by background threads while the next pages are processed,
+        see `fusus.workers.Writer`.
+        All files have been written when this method returns.
+        If some files could not be written, the run still finishes the others,
+        and then the first error is raised.
+
+        If the setting `database` is on, the OCR results of the pages are also
+        stored in the database of the book, see `Book.store`.
 
         Returns
         -------
@@ -449,48 +608,401 @@ class Book:
         proofDir = C.proofDir
         htmlDir = C.htmlDir
 
+        if output is None:
+            output = C.outputProfile
+        outputs = OUTPUT_PROFILES.get(output, None)
+        if outputs is None:
+            tm.error(
+                f"Unknown output profile: {output};"
+                f" choose one of {', '.join(OUTPUT_PROFILES)}"
+            )
+            return None
+
         for d in (interDir, outDir, cleanDir, proofDir, htmlDir):
             if not os.path.exists(d):
                 os.makedirs(d, exist_ok=True)
 
         imageFiles = select(allPages, pages)
         pagesDesc = pagesRep(imageFiles)
-        info(f"Batch of {len(imageFiles)} pages: {pagesDesc}")
+        info(f"Batch of {len(imageFiles)} pages: {pagesDesc} (output: {output})")
+
+        profiler = self.profiler
+        span = profiler.span
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        if profile or trace:
+            profiler.start(
+                path=f"{interDir}/{PROFILE_PREFIX}{stamp}.{PROFILE_EXT}"
+                if profile
+                else None,
+                trace=trace,
+            )
+
+        writeStages = tuple(
+            s for s in ("normalized", "histogram", "clean") if s in outputs
+        )
+        keep = writeStages + (("boxed",) if boxed and "boxed" in outputs else ())
+        blankStages = (
+            ()
+            if uptoLayout
+            else (("char", "word", "line") if doOcr else ())
+            + (() if batch else ("markData",))
+        )
+        self.outputs = set(outputs)
+        earlierStatus = self.manifest().get("pages", {})
+        pageStatus = {}
+        nBlank = 0
+
+        # the line heights of the pages of earlier runs give a prior for this run;
+        # it stays fixed during the run, so that the outcome does not depend on
+        # the order in which the pages are processed
+
+        if C.linePrior:
+            self.linePrior = linePrior(
+                (status.get("lineHeight", None) for status in earlierStatus.values()),
+                C.linePriorPages,
+                C.linePriorSpread,
+            )
+            if self.linePrior is not None:
+                info(f"Line height prior: {self.linePrior} pixels")
+
+        if C.writeWorkers > 0:
+            self.writer = Writer(workers=C.writeWorkers, pending=C.writeQueue)
+
+        store = self.store() if C.database and doOcr and not uptoLayout else None
+        self.storing = store is not None
 
         info("Start batch processing images")
         page = None
 
-        for (i, imFile) in enumerate(sorted(imageFiles)):
-            indent(level=1, reset=True)
-            msg = f"{i + 1:>5} {imFile:<40}"
-            info(f"{msg}\r", nl=False)
-            page = self._doPage(
-                imFile,
-                batch=batch,
-                boxed=boxed,
-                quiet=quiet,
-                doOcr=doOcr,
-                uptoLayout=uptoLayout,
-                **kwargs,
-            )
-            if not page.empty:
-                page.write(stage="normalized,histogram,clean", perBlock=False)
-                if uptoLayout:
-                    info(f"{msg}")
-                else:
-                    if not batch:
-                        page.write(stage="markData")
-                    if boxed:
-                        page.write(stage="boxed")
-                    info(f"{msg}")
+        grayscale = batch and not boxed
+        pageFiles = sorted(imageFiles)
+        prefetch = C.prefetch
+
+        def prefetchScan(imFile):
+            with span("prefetch", page=splitext(imFile)[0]):
+                return self._readScan(imFile, grayscale)
+
+        scans = (
+            Prefetcher(prefetchScan, pageFiles, ahead=prefetch)
+            if prefetch > 0
+            else ((imFile, None) for imFile in pageFiles)
+        )
+        writeErrors = []
+
+        try:
+            for (i, (imFile, scan)) in enumerate(scans):
+                indent(level=1, reset=True)
+                msg = f"{i + 1:>5} {imFile:<40}"
+                info(f"{msg}\r", nl=False)
+                bare = splitext(imFile)[0]
+                pageNum = int(bare.lstrip("0") or "0")
+                with span("page", page=bare):
+                    (blank, image) = (
+                        self._readScan(imFile, grayscale) if scan is None else scan
+                    )
+                    if blank:
+                        nBlank += 1
+                        pageStatus[bare] = dict(status="blank", run=stamp)
+                        if store is not None:
+                            store.deletePage(pageNum)
+                        if blankStages:
+                            with span("write"):
+                                self._writeBlank(imFile, blankStages)
+                        info(f"{msg} blank")
+                        continue
+
+                    page = self._doPage(
+                        imFile,
+                        batch=batch,
+                        boxed=boxed,
+                        quiet=quiet,
+                        doOcr=doOcr,
+                        uptoLayout=uptoLayout,
+                        keep=keep,
+                        image=image,
+                        **kwargs,
+                    )
+                    status = dict(status="empty" if page.empty else "done", run=stamp)
+
+                    # only line heights found without a prior go into the prior;
+                    # a run with a prior keeps the line height found earlier
+
+                    if page.empty:
+                        lineHeight = None
+                    elif self.linePrior is None:
+                        lineHeight = pageLineHeight(page.blocks)
+                    else:
+                        lineHeight = earlierStatus.get(bare, {}).get("lineHeight")
+                    if lineHeight is not None:
+                        status["lineHeight"] = round(lineHeight, 1)
+                    pageStatus[bare] = status
+                    if store is not None:
+                        with span("store"):
+                            if page.empty:
+                                store.deletePage(pageNum)
+                            else:
+                                store.putPage(pageNum, page.stages)
+                    if not page.empty:
+                        with span("write"):
+                            page.write(stage=writeStages, perBlock=False)
+                            if not uptoLayout:
+                                if not batch:
+                                    page.write(stage="markData")
+                                if boxed:
+                                    page.write(stage="boxed")
+                        info(f"{msg}")
+        finally:
+            self.outputs = None
+            self.storing = False
+            self.linePrior = None
+            if prefetch > 0:
+                scans.close()
+            writer = self.writer
+            if writer is not None:
+                self.writer = None
+                with span("flush"):
+                    writeErrors = writer.close()
+                for e in writeErrors:
+                    tm.error(f"While writing output: {e}")
+            if store is not None:
+                store.close()
+            profiler.stop()
+            self._writeManifest(pageStatus, stamp)
+
+        # a run must not end normally with files that have not been written
+
+        if writeErrors:
+            tm.error(f"{len(writeErrors)} output file(s) could not be written")
+            raise writeErrors[0]
+
         indent(level=0)
+        if nBlank:
+            info(f"{nBlank} blank pages skipped")
         info("all done")
+        if profile:
+            info(f"Profile in {unexpanduser(profiler.path)}")
+        if trace:
+            info(f"Trace in {unexpanduser(trace)}")
 
         return page  # the last page processed
 
+    def _readScan(self, imFile, grayscale):
+        """Checks a scan for blankness and reads it.
+
+        Parameters
+        ----------
+        imFile: string
+            The file name of the scan in the `in` directory.
+        grayscale: boolean
+            Whether to read it as grayscale, see `fusus.page.readScan`.
+
+        Returns
+        -------
+        tuple
+            Whether the page is blank, and the image, which is `None`
+            if the page is blank.
+        """
+
+        C = self.C
+        span = self.profiler.span
+        path = f"{C.inDir}/{imFile}"
+
+        if C.blankCheck:
+            with span("blankCheck"):
+                blank = isBlank(
+                    path,
+                    reduce=C.blankReduce,
+                    margin=C.blankMargin,
+                    contrast=C.blankContrast,
+                    ink=C.blankInk,
+                )
+            if blank:
+                return (True, None)
+
+        if not os.path.exists(path):
+            return (False, None)
+
+        with span("decode"):
+            image = readScan(path, grayscale)
+        return (False, image)
+
+    def _writeBlank(self, imFile, stages):
+        """Writes empty data files for a blank page.
+
+        Parameters
+        ----------
+        imFile: string
+            The file name of the scan in the `in` directory.
+        stages: tuple of string
+            The data stages to write, see `fusus.page.Page.write`.
+        """
+
+        page = Page(self, imFile, minimal=True)
+        page.stages.update({s: {} if s == "markData" else [] for s in stages})
+        page.write(stage=stages)
+
+    def manifest(self):
+        """Reads the manifest of the book.
+
+        The manifest is the file `manifest.json` in the `inter` directory.
+        It is updated by every run of `Book.process`.
+
+        Returns
+        -------
+        dict
+            Under key `pages` it has a dict keyed by page (file name without
+            extension) and valued by a dict with the `status` of the page in
+            the last run that processed it, and the timestamp of that `run`.
+
+            The status is one of
+
+            *   `blank`: the page has been found blank and has been skipped;
+            *   `empty`: the page has been processed, but no content has been found;
+            *   `done`: the page has been processed.
+
+            If lines have been detected on the page in a run without a line height
+            prior, there is also the `lineHeight` of the page,
+            see `fusus.lines.pageLineHeight`.
+            These line heights are the source of the line height prior,
+            see `fusus.lines.linePrior`.
+
+            Under key `run` it has the timestamp of the last run.
+        """
+
+        path = f"{self.C.interDir}/{MANIFEST_FILE}"
+        if not os.path.exists(path):
+            return {}
+
+        with open(path) as fh:
+            return json.load(fh)
+
+    def _writeManifest(self, pageStatus, stamp):
+        """Records the outcome of a run in the manifest.
+
+        The manifest is read again just before writing, and only the pages
+        of this run are replaced, so that the outcomes of runs that have
+        finished in the meantime are kept.
+        It is written to a temporary file first, which then replaces the
+        manifest in one go.
+
+        Parameters
+        ----------
+        pageStatus: dict
+            The status of the pages of this run, see `Book.manifest`.
+        stamp: string
+            The timestamp of this run.
+        """
+
+        interDir = self.C.interDir
+        if not os.path.exists(interDir):
+            os.makedirs(interDir, exist_ok=True)
+
+        manifest = self.manifest()
+        manifest.setdefault("pages", {}).update(pageStatus)
+        manifest["run"] = stamp
+
+        path = f"{interDir}/{MANIFEST_FILE}"
+        tmpPath = f"{path}.{os.getpid()}.tmp"
+        with open(tmpPath, "w") as fh:
+            json.dump(manifest, fh, indent=1, sort_keys=True)
+        os.replace(tmpPath, path)
+
+    def store(self):
+        """Opens the OCR database of the book.
+
+        The database is maintained by `Book.process` if the setting `database`
+        is on. If it does not exist yet, it will be created, without data.
+
+        Returns
+        -------
+        object
+            A `fusus.store.Store`; close it after use.
+        """
+
+        return Store(f"{self.C.interDir}/{STORE_FILE}")
+
+    def profileReport(self, path=None):
+        """Shows a summary of the measurements of a profiled run.
+
+        Per processing step we show the number of times it has been executed,
+        the total and mean wall time, the total CPU time, the peak memory and
+        the totals of the counters.
+
+        Steps within steps are shown with their full path, e.g.
+        `doLayout/getBlocks`.
+
+        Parameters
+        ----------
+        path: string, optional `None`
+            The profile file to summarize.
+            If `None`, the profile of the last profiled run is taken,
+            or, if there has not been such a run in this session,
+            the most recent profile file in the `inter` directory.
+
+        Returns
+        -------
+        list of tuple
+            The summary, as delivered by `fusus.profiler.summarize`.
+        """
+
+        tm = self.tm
+        info = tm.info
+        error = tm.error
+        C = self.C
+        interDir = C.interDir
+
+        if path is None:
+            path = self.profiler.path
+        if path is None:
+            profiles = (
+                sorted(
+                    f
+                    for f in os.listdir(interDir)
+                    if f.startswith(PROFILE_PREFIX) and f.endswith(f".{PROFILE_EXT}")
+                )
+                if os.path.exists(interDir)
+                else []
+            )
+            if not profiles:
+                error(f"No profiles found in {unexpanduser(interDir)}")
+                return None
+            path = f"{interDir}/{profiles[-1]}"
+
+        if not os.path.exists(path):
+            error(f"No such profile: {unexpanduser(path)}")
+            return None
+
+        records = readProfile(path)
+        summary = summarize(records)
+        nPages = len({r["page"] for r in records if r["page"] is not None})
+
+        info(f"Profile {unexpanduser(path)}: {nPages} pages", tm=False)
+        info(
+            f"{'step':<32} {'calls':>6} {'wall s':>9} {'mean ms':>9}"
+            f" {'cpu s':>9} {'peak MB':>8}  counters",
+            tm=False,
+        )
+        for (stage, calls, wall, cpu, rss, counters) in summary:
+            rssRep = "" if rss is None else f"{rss / 1024 / 1024:.0f}"
+            countRep = " ".join(f"{k}={n}" for (k, n) in sorted(counters.items()))
+            info(
+                f"{stage:<32} {calls:>6} {wall:>9.3f} {wall / calls * 1000:>9.1f}"
+                f" {cpu:>9.3f} {rssRep:>8}  {countRep}",
+                tm=False,
+            )
+
+        return summary
+
     def stageDir(self, stage):
         C = self.C
-        (stageType, stageColor, stageExt, stageDir, stagePart) = C.stages[stage]
+        (
+            stageType,
+            stageColor,
+            stageExt,
+            stageDir,
+            stagePart,
+            consumers,
+        ) = C.stages[stage]
         trail = stage if stagePart is None else "" if not stagePart else stagePart
         trail = "" if not trail else f"-{trail}"
         return (getattr(C, stageDir or "interDir"), trail, stageExt)
@@ -536,50 +1048,64 @@ class Book:
         page = None
 
         results = dict(char=[], word=[])
-        resultsChar = collections.defaultdict(list)
+        resultsChar = {}
 
         for (i, imFile) in enumerate(sorted(imageFiles)):
             indent(level=1, reset=True)
             msg = f"{i + 1:>5} {imFile:<40}"
             info(f"{msg}\r", nl=False)
             page = Page(self, imFile, minimal=True)
-            page.read(stage=("normalized,line," if updateProofs else "") + "word,char")
-            if page.empty:
-                continue
 
             if updateProofs:
+                page.read(stage="normalized,line,word,char")
+                if page.empty:
+                    continue
                 page.proofing()
 
             if not showStats:
                 continue
 
-            stages = page.stages
+            # we work with the summaries per page, not with the results themselves,
+            # see `fusus.ocr.qualitySummary`
+
+            summary = page.quality()
+            if summary is None:
+                continue
+
             pg = page.bare
             pageRep = f"p{pg}"
 
             for stage in ("word", "char"):
                 proofStage = f"proof{stage}"
                 thisPageRep = f"""<a href="{page.stagePath(proofStage)}">p{pg}</a>"""
-                isCharStage = stage == "char"
-                confI = -2 if isCharStage else -3
-
-                n = 0
-                totC = 0
-                (minC, maxC) = (100, 0)
-
-                for fields in stages[stage]:
-                    conf = int(fields[confI])
-                    totC += conf
-                    if conf < minC:
-                        minC = conf
-                    if conf > maxC:
-                        maxC = conf
-                    n += 1
-                    if isCharStage:
-                        c = fields[-1]
-                        resultsChar[c].append((pageRep, conf))
+                stats = summary[stage]
+                n = stats["n"]
                 if n > 0:
-                    results[stage].append((thisPageRep, n, minC, maxC, totC, ""))
+                    results[stage].append(
+                        (thisPageRep, n, stats["min"], stats["max"], stats["total"], "")
+                    )
+
+            for (c, stats) in summary["chars"].items():
+                occs = ((pageRep, conf) for conf in stats["worst"])
+                if c in resultsChar:
+                    (nOccs, minC, maxC, totC, worst) = resultsChar[c]
+                    resultsChar[c] = (
+                        nOccs + stats["n"],
+                        min((minC, stats["min"])),
+                        max((maxC, stats["max"])),
+                        totC + stats["total"],
+                        heapq.nsmallest(
+                            WORST_EXAMPLES, chain(worst, occs), key=lambda x: x[1]
+                        ),
+                    )
+                else:
+                    resultsChar[c] = (
+                        stats["n"],
+                        stats["min"],
+                        stats["max"],
+                        stats["total"],
+                        list(occs),
+                    )
 
         if not showStats:
             indent(level=0)
@@ -608,11 +1134,11 @@ class Book:
         showPath = unexpanduser(f"{cd}{sDir}")
         (isLink, nbLink) = getNbPath(showPath)
         for c in sorted(resultsChar):
-            occs = sorted(resultsChar[c], key=lambda x: x[1])
+            (nOccs, minC, maxC, totC, occs) = resultsChar[c]
             elem = "a" if isLink else "span"
             href = nbLink if isLink else None
             worstExamples = []
-            for x in occs[0:20]:
+            for x in occs:
                 href = (
                     f'''href="{nbLink}/{x[0][1:]}{sTrail}.{sExt}"''' if isLink else ""
                 )
@@ -626,10 +1152,6 @@ class Book:
 """
                 )
             worstExamples = " ".join(worstExamples)
-            nOccs = len(occs)
-            minC = min(r[1] for r in occs)
-            maxC = max(r[1] for r in occs)
-            totC = sum(r[1] for r in occs)
             resultsCollected.append((f"⌊{c}⌋", nOccs, minC, maxC, totC, worstExamples))
         showConf(stage, resultsCollected, label="worst results")
 
@@ -650,6 +1172,12 @@ class Book:
             No spaces allowed.
 
         The output is written to the working directory.
+
+        The lines of the word files of the pages are copied as they are,
+        with the page number in front; they are not parsed.
+        If the setting `prefetch` is positive, the files of the next pages
+        are read in background threads while the current page is written,
+        see `fusus.workers.Prefetcher`.
         """
 
         tm = self.tm
@@ -666,40 +1194,47 @@ class Book:
 
         path = f"{pagesFile}.tsv"
 
-        first = True
-        f = None
-
-        for (i, imFile) in enumerate(sorted(imageFiles)):
-            page = Page(self, imFile, minimal=True)
-            stages = page.stages
-            stage = "word"
-
-            if first:
-                headers = page.dataHeaders.get(stage, None)
-                header = "\t".join(str(head) for head in headers)
-
-                f = open(path, "w")
-                f.write(f"{header}\n")
-
-                first = False
-
-            pageNum = int(page.bare.lstrip("0") or "0")
-            page.read(stage=stage)
+        if not imageFiles:
+            info("Nothing written")
+            return
 
-            data = stages[stage]
-            if not data:
-                continue
+        # we do not parse the page files: we copy their lines,
+        # with the page number in front
+
+        (sDir, sTrail, sExt) = self.stageDir("word")
+
+        def readWords(imFile):
+            bare = splitext(imFile)[0]
+            pagePath = f"{sDir}/{bare}{sTrail}.{sExt}"
+            if not os.path.exists(pagePath):
+                return None
+            with open(pagePath) as fh:
+                next(fh, None)  # header line
+                body = fh.read()
+            if not body:
+                return None
+            if body.endswith("\n"):
+                body = body[0:-1]
+            prefix = f"{int(bare.lstrip('0') or '0')}\t"
+            return prefix + body.replace("\n", f"\n{prefix}") + "\n"
+
+        pageFiles = sorted(imageFiles)
+        prefetch = self.C.prefetch
+        chunks = (
+            Prefetcher(readWords, pageFiles, ahead=prefetch)
+            if prefetch > 0
+            else ((imFile, readWords(imFile)) for imFile in pageFiles)
+        )
 
-            for fields in stages[stage]:
-                f.write(f"{pageNum}\t" + "\t".join(str(f) for f in fields) + "\n")
+        with open(path, "w") as f:
+            f.write("\t".join(HEADERS) + "\n")
+            for (imFile, chunk) in chunks:
+                if chunk:
+                    f.write(chunk)
 
-        if f:
-            info(f"written to {path}")
-            f.close()
-        else:
-            info("Nothing written")
+        info(f"written to {path}")
 
-    def htmlPages(self, pages=None):
+    def htmlPages(self, pages=None, volume=None):
         """Get the text in html from the ocr output in one file
 
         pages: string | int, optional `None`
@@ -711,7 +1246,14 @@ class Book:
             E.g. `1` and `5-7` and `2-5,8-10`, and `-10,15-20,30-`.
             No spaces allowed.
 
+        volume: int, optional `None`
+            If given, the output is split into volumes of this many pages,
+            each in a file named after its pages, and the file that would otherwise
+            hold all pages becomes an index of the volumes.
+
         The output is written to the `text` subdirectory.
+        The pages are written to file as soon as they have been produced,
+        so the memory needed does not grow with the number of pages.
         """
 
         tm = self.tm
@@ -733,114 +1275,122 @@ class Book:
 
         info("Start producing plain text of these pages")
 
-        page = None
-
         fileName = f"{pagesDesc}.html"
         path = f"{htmlDir}/{fileName}"
 
-        doc = """\
-<html>
-  <head>
-  <meta charset="utf-8"/>
-<style>
-body {
-  font-size: x-large;
-  text-align: right;
-  direction: rtl;
-}
-div.page {
-  text-align: right;
-}
-div.stripe {
-  display: flex;
-  flex-flow: row nowrap;
-}
-div.c, div.cl, div.cr {
-  text-align: right;
-}
-h3 {
-  text-align: right;
-}
-span.ln {
-  font-style: italic;
-  font-size: small;
-  vertical-align: super;
-  text-align: right;
-}
-</style>
-  </head>
-«body»
-</body>
-</html>
-"""
-        body = []
+        pageFiles = sorted(imageFiles)
+        volumes = (
+            [pageFiles]
+            if not volume or len(pageFiles) <= volume
+            else [
+                pageFiles[i : i + volume] for i in range(0, len(pageFiles), volume)
+            ]
+        )
+        volumeNames = [f"{pagesRep(volFiles)}.html" for volFiles in volumes]
+
+        def getNav(v):
+            links = [f"""<a href="{fileName}">index</a>"""]
+            if v > 0:
+                links.insert(0, f"""<a href="{volumeNames[v - 1]}">previous</a>""")
+            if v < len(volumes) - 1:
+                links.append(f"""<a href="{volumeNames[v + 1]}">next</a>""")
+            return f"""<p class="nav">{" | ".join(links)}</p>\n"""
+
+        def getBody(volFiles, start):
+            for (i, imFile) in enumerate(volFiles):
+                pageMaterial = []
+                indent(level=1, reset=True)
+                msg = f"{start + i + 1:>5} {imFile:<40}"
+                info(f"{msg}\r", nl=False)
+                if i:
+                    yield "\n"
+                page = Page(self, imFile, minimal=True)
+                page.read(stage="word")
+                pg = page.bare.lstrip("0")
+                if pg == "":
+                    pg = "0"
+                pg = int(pg)
+                pageRep = f"p{pg:>03}"
+                pageMaterial.append(f"""<div page="{pageRep}"><h3>{pg}</h3>""")
+
+                if page.empty:
+                    pageMaterial.append("""</div>""")
+                    yield "\n".join(pageMaterial)
+                    continue
 
-        for (i, imFile) in enumerate(sorted(imageFiles)):
-            pageMaterial = []
-            indent(level=1, reset=True)
-            msg = f"{i + 1:>5} {imFile:<40}"
-            info(f"{msg}\r", nl=False)
-            page = Page(self, imFile, minimal=True)
-            page.read(stage="word")
-            pg = page.bare.lstrip("0")
-            if pg == "":
-                pg = "0"
-            pg = int(pg)
-            pageRep = f"p{pg:>03}"
-            pageMaterial.append(f"""<div page="{pageRep}"><h3>{pg}</h3>""")
+                stages = page.stages
+                stage = "word"
 
-            if page.empty:
-                pageMaterial.append("""</div>""")
-                body.append("\n".join(pageMaterial))
-                continue
+                (prevStripe, prevBlock, prevLine) = (None, None, None)
+                stripeMaterial = []
+                blockMaterial = []
+                lineMaterial = []
 
-            stages = page.stages
-            stage = "word"
-
-            (prevStripe, prevBlock, prevLine) = (None, None, None)
-            stripeMaterial = []
-            blockMaterial = []
-            lineMaterial = []
-
-            for fields in stages[stage]:
-                (stripe, block, line) = fields[0:3]
-                if stripe != prevStripe:
-                    if prevStripe is not None:
-                        stripeMaterial.append("</div>")
-                        pageMaterial.append("\n".join(stripeMaterial))
-                        stripeMaterial = []
-                    stripeMaterial.append(f"""<div class="stripe" stripe="{stripe}">""")
-                    prevBlock = None
-                if block != prevBlock:
-                    if prevBlock is not None:
-                        blockMaterial.append("</div>")
-                        stripeMaterial.append("\n".join(blockMaterial))
-                        blockMaterial = []
-                    blockMaterial.append(f"""<div class="c{block}">""")
-                    prevLine = None
-                if line != prevLine:
-                    if prevLine is not None:
-                        lineMaterial.append("</div>")
-                        blockMaterial.append(" ".join(lineMaterial))
-                        lineMaterial = []
-                    lineMaterial.append(
-                        f"""<div line="{line}"><span class="ln">{line}</span>"""
+                for fields in stages[stage]:
+                    (stripe, block, line) = fields[0:3]
+                    if stripe != prevStripe:
+                        if prevStripe is not None:
+                            stripeMaterial.append("</div>")
+                            pageMaterial.append("\n".join(stripeMaterial))
+                            stripeMaterial = []
+                        stripeMaterial.append(
+                            f"""<div class="stripe" stripe="{stripe}">"""
+                        )
+                        prevBlock = None
+                    if block != prevBlock:
+                        if prevBlock is not None:
+                            blockMaterial.append("</div>")
+                            stripeMaterial.append("\n".join(blockMaterial))
+                            blockMaterial = []
+                        blockMaterial.append(f"""<div class="c{block}">""")
+                        prevLine = None
+                    if line != prevLine:
+                        if prevLine is not None:
+                            lineMaterial.append("</div>")
+                            blockMaterial.append(" ".join(lineMaterial))
+                            lineMaterial = []
+                        lineMaterial.append(
+                            f"""<div line="{line}"><span class="ln">{line}</span>"""
+                        )
+                    (prevStripe, prevBlock, prevLine) = (stripe, block, line)
+
+                    word = fields[-2]
+                    punc = fields[-1]
+                    lineMaterial.append(f"{word}{punc}")
+
+                blockMaterial.append(" ".join(lineMaterial))
+                stripeMaterial.append("\n".join(blockMaterial))
+                pageMaterial.append("\n".join(stripeMaterial))
+                pageMaterial.append("</div>")
+                yield "\n".join(pageMaterial)
+
+        if len(volumes) == 1:
+            with open(path, "w") as f:
+                TEXT_TEMPLATE.write(f, body=getBody(pageFiles, 0))
+        else:
+            start = 0
+            for (v, volFiles) in enumerate(volumes):
+                with open(f"{htmlDir}/{volumeNames[v]}", "w") as f:
+                    TEXT_TEMPLATE.write(
+                        f, body=chain((getNav(v),), getBody(volFiles, start))
                     )
-                (prevStripe, prevBlock, prevLine) = (stripe, block, line)
-
-                word = fields[-2]
-                punc = fields[-1]
-                lineMaterial.append(f"{word}{punc}")
-
-            blockMaterial.append(" ".join(lineMaterial))
-            stripeMaterial.append("\n".join(blockMaterial))
-            pageMaterial.append("\n".join(stripeMaterial))
-            pageMaterial.append("</div>")
-            body.append("\n".join(pageMaterial))
+                start += len(volFiles)
+
+            with open(path, "w") as f:
+                INDEX_TEMPLATE.write(
+                    f,
+                    title=f"pages {pagesDesc}",
+                    body=(
+                        f"""<li><a href="{volumeNames[v]}">"""
+                        f"""pages {splitext(volumeNames[v])[0]}</a>"""
+                        f""" ({len(volFiles)} pages)</li>\n"""
+                        for (v, volFiles) in enumerate(volumes)
+                    ),
+                )
+            indent(level=0)
+            info(f"{len(volumes)} volumes of at most {volume} pages")
 
         indent(level=0)
-        with open(path, "w") as f:
-            f.write(doc.replace("«body»", "\n".join(body)))
         info(f"written to {path}")
         showPath = unexpanduser(f"{cd}{path}")
         nbLink = getNbLink(showPath, fileName)
@@ -90,6 +90,7 @@ from tf.core.helpers import setFromSpec, unexpanduser
 
 from .parameters import SOURCE_DIR, UR_DIR, ALL_PAGES, LINE_CLUSTER_FACTOR
 from .lib import DEFAULT_EXTENSION, pprint, parseNums
+from .template import Template
 from .char import (
     UChar,
     EMSPACE,
@@ -329,6 +330,24 @@ POST_HTML = """
 """
 
 
+PRE_HTML = Template(
+    """\
+<html>
+    <head>
+        <meta name="viewport" content="width=device-width, initial-scale=1.0"/>
+        <meta charset="utf-8"/>
+        <title>Lakhnawi «pageNum»</title>
+«css»
+    </head>
+    <body>
+"""
+)
+"""HTML code prefixed to the HTML representation of a page.
+
+It has slots for the page number and the style sheet, see `preHtml`.
+"""
+
+
 def preHtml(pageNum):
     """Generate HTML code to be prefixed to the HTML representation of a page.
 
@@ -338,16 +357,7 @@ def preHtml(pageNum):
         The page number of the page for which HTML is generated.
     """
 
-    return f"""\
-<html>
-    <head>
-        <meta name="viewport" content="width=device-width, initial-scale=1.0"/>
-        <meta charset="utf-8"/>
-        <title>Lakhnawi {pageNum}</title>
-{CSS}
-    </head>
-    <body>
-"""
+    return PRE_HTML.render(pageNum=pageNum, css=CSS)
 
 
 def getToc(pageNums):
@@ -1698,7 +1708,7 @@ class Lakhnawi(UChar):
                 tocRep = "-with-toc" if toc else ""
                 filePath = f"{destDir}/{pageNumRep}{tocRep}.html"
                 fh = open(filePath, "w")
-                fh.write(preHtml(f"{pageNumRep}{tocRep}"))
+                PRE_HTML.write(fh, pageNum=f"{pageNumRep}{tocRep}", css=CSS)
                 if toc:
                     toc = getToc(pageNums)
                     fh.write(
@@ -1742,15 +1752,14 @@ class Lakhnawi(UChar):
             html.append("""</div>""")
 
             if export:
-                htmlRep = "".join(html)
-
                 if singleFile:
-                    fh.write(htmlRep)
+                    fh.writelines(html)
                 else:
-                    html = preHtml(pageNum) + htmlRep + POST_HTML
                     filePath = f"{destDir}/p{pageNum:>03}.html"
                     with open(filePath, "w") as fh:
-                        fh.write(html)
+                        PRE_HTML.write(fh, pageNum=pageNum, css=CSS)
+                        fh.writelines(html)
+                        fh.write(POST_HTML)
                         filesWritten += 1
             else:
                 display(HTML("\n".join(html)))
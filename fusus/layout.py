@@ -364,7 +364,7 @@ def getStripes(stages, stretchesV):
     return stripes
 
 
-def getBlocks(C, info, stages, pageH, stripes, stretchesH, batch):
+def getBlocks(C, info, stages, pageH, stripes, stretchesH, batch, prior=None):
     """Fine-tune stripes into blocks.
 
     We enlarge the stripes vertically by roughly a line height
@@ -400,6 +400,8 @@ def getBlocks(C, info, stages, pageH, stripes, stretchesH, batch):
         The horizontal stretches across which we do not shrink of enlarge
     batch: boolean
         Whether we run in batch mode.
+    prior: int, optional `None`
+        The line height prior of the book, see `fusus.lines.linePrior`.
 
     Returns
     -------
@@ -417,6 +419,7 @@ def getBlocks(C, info, stages, pageH, stripes, stretchesH, batch):
     blockColor = C.blockRGB
     letterColor = C.letterRGB
     blurred = stages["blurred"]
+    integral = stages.get("integral", None)
     normalized = stages["normalized"]
 
     (maxH, maxW) = normalized.shape[0:2]
@@ -438,7 +441,19 @@ def getBlocks(C, info, stages, pageH, stripes, stretchesH, batch):
 
         if x is None:
             (theYMin, theYMax) = adjustVertical(
-                C, info, blurred, pageH, 0, maxW, yMin, yMinLee, yMax, yMaxLee, False
+                C,
+                info,
+                blurred,
+                pageH,
+                0,
+                maxW,
+                yMin,
+                yMinLee,
+                yMax,
+                yMaxLee,
+                False,
+                integral=integral,
+                prior=prior,
             )
             blocks[(stripe, "")] = dict(
                 box=(marginX, theYMin, maxW - marginX, theYMax),
@@ -476,6 +491,8 @@ def getBlocks(C, info, stages, pageH, stripes, stretchesH, batch):
                 yMax,
                 yMaxLeeBound,
                 True,
+                integral=integral,
+                prior=prior,
             )
             (theYMinR, theYMaxR) = adjustVertical(
                 C,
@@ -489,6 +506,8 @@ def getBlocks(C, info, stages, pageH, stripes, stretchesH, batch):
                 yMax,
                 yMaxLeeBound,
                 True,
+                integral=integral,
+                prior=prior,
             )
             blocks[(stripe, "l")] = dict(
                 box=(marginX, theYMinL, x - marginX, theYMaxL), sep=x
@@ -566,9 +585,12 @@ def applyHRules(C, stages, stretchesH, stripes, blocks, batch, boxed):
     stages["demargined"] = demargined
     if not batch:
         layout = stages["layout"]
-    if not batch or boxed:
-        normalizedC = stages["normalizedC"]
-        demarginedC = normalizedC.copy()
+    if not batch:
+        demarginedC = stages["normalizedC"].copy()
+        stages["demarginedC"] = demarginedC
+    elif boxed:
+        # in batch mode normalizedC has no other consumer, so we take it over
+        demarginedC = stages.pop("normalizedC")
         stages["demarginedC"] = demarginedC
 
     (maxH, maxW) = normalized.shape[0:2]
@@ -717,7 +739,19 @@ def grayInterBlocks(C, stages, blocks):
 
 
 def adjustVertical(
-    C, info, blurred, pageH, left, right, yMin, yMinLee, yMax, yMaxLee, preferExtend
+    C,
+    info,
+    blurred,
+    pageH,
+    left,
+    right,
+    yMin,
+    yMinLee,
+    yMax,
+    yMaxLee,
+    preferExtend,
+    integral=None,
+    prior=None,
 ):
     """Adjust the height of blocks.
 
@@ -753,6 +787,10 @@ def adjustVertical(
         Whether we want to increase or rather decrease the vertical size of the block.
         Blocks next to dividing lines are meant to be increased, blocks that
         span the whole page width are meant to be decreased.
+    integral: np array, optional `None`
+        The integral image of `blurred`, see `fusus.lines.getIntegral`.
+    prior: int, optional `None`
+        The line height prior of the book, see `fusus.lines.linePrior`.
 
     Returns
     -------
@@ -771,7 +809,18 @@ def adjustVertical(
         return (theYMin, theYMax)
 
     lines = getInkY(
-        C, info, blurred, pageH, left, yMinLee, right, yMaxLee, False, imgOut=None
+        C,
+        info,
+        blurred,
+        pageH,
+        left,
+        yMinLee,
+        right,
+        yMaxLee,
+        False,
+        imgOut=None,
+        integral=integral,
+        prior=prior,
     )
     normHLee = yMaxLee - yMinLee
     topProper = yMin - yMinLee
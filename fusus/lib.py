@@ -178,6 +178,8 @@ def overlay(img, left, top, right, bottom, srcColor, dstColor):
     In this way you can replace all the white with gray, for example,
     without wiping out existing non-white pixels.
 
+    If you have many regions to color, use `overlayMany`.
+
     Parameters
     ----------
     img: np array
@@ -189,9 +191,70 @@ def overlay(img, left, top, right, bottom, srcColor, dstColor):
     dstColor:
         The new color of the replaced pixels.
     """
-    if right > left and bottom > top:
-        roi = img[top:bottom, left:right]
-        roi[np.where((roi == list(srcColor)).all(axis=2))] = dstColor
+    overlayMany(img, ((left, top, right, bottom, dstColor),), srcColor)
+
+
+def overlayMany(img, regions, srcColor):
+    """Colors many regions of an image with care.
+
+    Does the same as calling `overlay` for each region in turn,
+    but in a single call, which pays off when there are many small regions,
+    such as the spaces between the lines of a block.
+
+    Later regions may overlap earlier ones: pixels that have been
+    recolored by an earlier region are left alone by the later ones,
+    exactly as with consecutive calls to `overlay`.
+
+    Parameters
+    ----------
+    img: np array
+        The image to be overlain with new colors
+    regions: iterable of (int, int, int, int, RGB color)
+        The regions in the image to be colored, as `(left, top, right, bottom)`,
+        each followed by the new color of the replaced pixels in that region.
+    srcColor: RGB color
+        The color of the pixels that may be replaced.
+    """
+
+    srcColor = tuple(srcColor)
+    fills = {}
+
+    for (left, top, right, bottom, dstColor) in regions:
+        if right > left and bottom > top:
+            roi = img[top:bottom, left:right]
+            if not roi.size:
+                continue
+            dstColor = tuple(dstColor)
+            if dstColor == srcColor:
+                continue
+            (h, w) = roi.shape[0:2]
+            fill = fills.get(dstColor, None)
+            if fill is None or fill.shape[0] < h or fill.shape[1] < w:
+                fill = solid(roi, dstColor)
+                fills[dstColor] = fill
+            mask = cv2.inRange(roi, srcColor, srcColor)
+            cv2.copyTo(fill[0:h, 0:w], mask, roi)
+
+
+def solid(img, color):
+    """Makes an image of a single color with the shape of a given image.
+
+    Parameters
+    ----------
+    img: np array
+        The image whose shape is taken.
+    color: RGB color
+        The color of the new image.
+
+    Returns
+    -------
+    np array
+    """
+
+    (h, w) = img.shape[0:2]
+    return cv2.resize(
+        np.array([[color]], dtype=img.dtype), (w, h), interpolation=cv2.INTER_NEAREST
+    )
 
 
 def splitext(f, withDot=True):
@@ -366,24 +429,25 @@ def cropBorders(img, tolerance=10):
         This will be used in `removeBorders` to whiten the margins outside it.
     """
 
+    # We reduce the image to the minimum value per row and per column;
+    # a row or column contains black pixels iff its minimum is below tolerance.
+    # This avoids materializing the coordinates of all black pixels.
+
+    rows = np.flatnonzero(cv2.reduce(img, 1, cv2.REDUCE_MIN) < tolerance)
+
     # check whether image is completely non-black
     # then we do not crop
-    if np.amin(img) >= tolerance:
+    if not len(rows):
         (imH, imW) = img.shape[0:2]
         print("*", 0, imW, 0, imH)
         return (0, imW, 0, imH)
 
-    # Mask of black pixels
-    mask = img < tolerance
-
-    # Coordinates of black pixels.
-    coords = np.argwhere(mask)
+    cols = np.flatnonzero(cv2.reduce(img, 0, cv2.REDUCE_MIN) < tolerance)
 
     # Bounding box of black pixels.
-    (y0, x0) = coords.min(axis=0)
-    (y1, x1) = coords.max(axis=0)
+    (y0, y1) = (rows[0], rows[-1])
+    (x0, x1) = (cols[0], cols[-1])
 
-    # Get the contents of the bounding box.
     return (x0, x1, y0, y1)
 
 
@@ -410,21 +474,111 @@ def removeBorders(img, crop, white):
 
     Returns
     -------
-    None
+    boolean
+        Whether the image has changed.
         The source image receives a modification.
     """
 
     (imH, imW) = img.shape[0:2]
     (x0, x1, y0, y1) = crop
+    changed = False
+
+    # the rectangles include their corner points, hence the + 1
 
-    for rect in (
-        ((0, 0), (x0, imH)),
-        ((0, 0), (imW, y0)),
-        ((x1, 0), (imW, imH)),
-        ((0, y1), (imW, imH)),
+    for (rect, region) in (
+        (((0, 0), (x0, imH)), img[:, 0 : x0 + 1]),
+        (((0, 0), (imW, y0)), img[0 : y0 + 1, :]),
+        (((x1, 0), (imW, imH)), img[:, x1:]),
+        (((0, y1), (imW, imH)), img[y1:, :]),
     ):
+        if not changed and (region != white).any():
+            changed = True
         cv2.rectangle(img, *rect, white, -1)
 
+    return changed
+
+
+def overlapping(rects):
+    """Whether some of the given rectangles overlap.
+
+    Parameters
+    ----------
+    rects: iterable of (int, int, int, int)
+        Rectangles given as left, top, right, bottom,
+        where right and bottom are exclusive.
+
+    Returns
+    -------
+    boolean
+    """
+
+    rects = list(rects)
+    for (i, (left1, top1, right1, bottom1)) in enumerate(rects):
+        for (left2, top2, right2, bottom2) in rects[i + 1 :]:
+            if left1 < right2 and left2 < right1 and top1 < bottom2 and top2 < bottom1:
+                return True
+    return False
+
+
+REDUCED_GRAYSCALE = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+"""Decoding flags for reading images as grayscale at a reduced size."""
+
+
+def isBlank(path, reduce=4, margin=0.1, contrast=64, ink=0.001):
+    """Whether a scanned page is blank.
+
+    We decide this on a version of the image that is decoded at a reduced size,
+    which is much cheaper than the full processing of the page.
+
+    We leave out the margins of the page, where scanning borders may occur.
+    The paper tone is the median of the rest.
+    Pixels that are darker than the paper by a certain contrast count as ink.
+    If there is hardly any ink, the page is blank.
+
+    Parameters
+    ----------
+    path: string
+        The path to the image file.
+    reduce: int, optional 4
+        The factor by which the image is reduced when decoding: 1, 2, 4 or 8.
+    margin: float, optional 0.1
+        The fraction of the width and the height that is left out on each side.
+    contrast: int, optional 64
+        How much darker than the paper a pixel must be in order to count as ink.
+    ink: float, optional 0.001
+        If the fraction of ink pixels is below this, the page is blank.
+
+    Returns
+    -------
+    boolean
+        If the image cannot be read, the result is `False`, so that the page
+        will be processed in full and trouble will be reported there.
+    """
+
+    img = cv2.imread(path, REDUCED_GRAYSCALE.get(reduce, cv2.IMREAD_GRAYSCALE))
+    if img is None:
+        return False
+
+    (imH, imW) = img.shape[0:2]
+    (mH, mW) = (int(imH * margin), int(imW * margin))
+    inner = img[mH : imH - mH, mW : imW - mW]
+    size = inner.size
+    if not size:
+        return False
+
+    # one histogram gives both the median and the number of dark pixels
+
+    cumulative = np.bincount(inner.ravel(), minlength=256).cumsum()
+    paper = int(np.searchsorted(cumulative, size / 2))
+    darkest = paper - contrast
+    nInk = cumulative[darkest - 1] if darkest > 0 else 0
+    return nInk < ink * size
+
 
 def parseStages(stage, allStages, sortedStages, error):
     """Parses a string that specifies stages.
@@ -10,7 +10,7 @@ We will need some signal processing tools from
 in particular
 [find_peaks](https://docs.scipy.org/doc/scipy/reference/generated/scipy.signal.find_peaks.html#scipy.signal.find_peaks)
 and
-[medfilt](https://docs.scipy.org/doc/scipy/reference/generated/scipy.signal.medfilt.html#scipy.signal.medfilt),
+[median_filter](https://docs.scipy.org/doc/scipy/reference/generated/scipy.ndimage.median_filter.html),
 to filter the peaks into significant peaks.
 
 We also need to massage the ink histograms in order to correct for short lines.
@@ -18,17 +18,19 @@ We also need to massage the ink histograms in order to correct for short lines.
 
 import cv2
 import numpy as np
-from scipy.signal import find_peaks, medfilt
+from scipy.signal import find_peaks
+from scipy.ndimage import median_filter
 
 from .lib import (
     applyBandOffset,
     getMargins,
     overlay,
+    overlayMany,
     pureAverage,
 )
 
 
-def getInkDistribution(C, info, stages, pageH, blocks, batch, boxed):
+def getInkDistribution(C, info, stages, pageH, blocks, batch, boxed, prior=None):
     """Add line band data to all blocks based on histograms.
 
     By means of histograms we can discern where the lines are.
@@ -55,6 +57,8 @@ def getInkDistribution(C, info, stages, pageH, blocks, batch, boxed):
         Whether we run in batch mode.
     boxed: boolean
         Whether we run in boxed mode (generate boxes around wiped marks).
+    prior: int, optional `None`
+        The line height prior of the book, see `linePrior`.
 
     Returns
     -------
@@ -74,6 +78,7 @@ def getInkDistribution(C, info, stages, pageH, blocks, batch, boxed):
         stages["histogram"] = histogram
 
     blurred = stages["blurred"]
+    integral = stages.get("integral", None)
     demargined = stages["demargined"]
 
     emptyBlocks = []
@@ -88,9 +93,22 @@ def getInkDistribution(C, info, stages, pageH, blocks, batch, boxed):
             continue
 
         imgOut = histogram if not batch else None
-        histX = getInkX(blurred, left, top, right, bottom, imgOut=imgOut)
+        histX = getInkX(
+            blurred, left, top, right, bottom, imgOut=imgOut, integral=integral
+        )
         lines = getInkY(
-            C, info, blurred, pageH, left, top, right, bottom, True, imgOut=imgOut
+            C,
+            info,
+            blurred,
+            pageH,
+            left,
+            top,
+            right,
+            bottom,
+            True,
+            imgOut=imgOut,
+            integral=integral,
+            prior=prior,
         )
 
         # chop off the left and right margins of a region
@@ -145,7 +163,123 @@ def getInkDistribution(C, info, stages, pageH, blocks, batch, boxed):
     return emptyBlocks
 
 
-def getInkX(imgIn, left, top, right, bottom, imgOut=None):
+def pageLineHeight(blocks):
+    """The typical line height on a page.
+
+    Parameters
+    ----------
+    blocks: dict
+        The blocks of a page after line detection, see `getInkDistribution`.
+
+    Returns
+    -------
+    float | None
+        The median of the distances between consecutive lines
+        in all blocks of the page,
+        or `None` if no block has more than one line.
+    """
+
+    heights = []
+    for data in blocks.values():
+        lines = data.get("bands", {}).get("main", {}).get("lines", [])
+        heights.extend(lines[i][0] - lines[i - 1][0] for i in range(1, len(lines)))
+    return float(np.median(heights)) if heights else None
+
+
+def linePrior(heights, minPages, maxSpread):
+    """Derives a line height prior from the line heights of pages.
+
+    The pages of a book share the same typesetting, so the line heights
+    found on the pages that have been processed before are a good guide
+    for the line detection on the others.
+
+    We take the median of the line heights of the pages.
+    We only trust it if there are enough pages and if the line heights
+    do not vary too much among them: the median of the absolute deviations
+    from the median, relative to the median, must not exceed `maxSpread`.
+
+    The prior is a function of the set of page line heights only,
+    so it does not depend on the order in which the pages have been processed.
+
+    Parameters
+    ----------
+    heights: iterable of float
+        The line heights of individual pages, see `pageLineHeight`.
+    minPages: int
+        The minimum number of pages.
+    maxSpread: float
+        The maximum relative spread of the line heights.
+
+    Returns
+    -------
+    int | None
+        The prior line height, or `None` if it cannot be trusted.
+    """
+
+    heights = np.array([h for h in heights if h], dtype=float)
+    if heights.size == 0 or heights.size < minPages:
+        return None
+
+    median = np.median(heights)
+    spread = np.median(np.abs(heights - median)) / median
+    return int(round(median)) if spread <= maxSpread else None
+
+
+def getIntegral(img):
+    """Computes the integral image of an image.
+
+    The integral image (summed-area table) holds at each position the sum of the
+    pixels above and to the left of it.
+    From it we read off the amount of ink in the rows and columns of any
+    rectangle without visiting its pixels, see `integralRows` and `integralCols`.
+
+    Parameters
+    ----------
+    img: np array
+        Input image, in practice the *blurred* stage of a page.
+
+    Returns
+    -------
+    np array
+        One row and one column larger than the input image, with 32-bit integers.
+        On very large images the sums wrap around, but the differences between
+        them, which are the sums of rows and columns of a region, are still exact,
+        because the sum of a single row or column fits.
+    """
+
+    return cv2.integral(img, sdepth=cv2.CV_32S)
+
+
+def integralRows(integral, left, top, right, bottom):
+    """The sums of the rows of a region, taken from an integral image."""
+
+    above = integral[top:bottom]
+    below = integral[top + 1 : bottom + 1]
+    return (below[:, right] - below[:, left]) - (above[:, right] - above[:, left])
+
+
+def integralCols(integral, left, top, right, bottom):
+    """The sums of the columns of a region, taken from an integral image."""
+
+    upper = integral[top]
+    lower = integral[bottom]
+    return (lower[left + 1 : right + 1] - lower[left:right]) - (
+        upper[left + 1 : right + 1] - upper[left:right]
+    )
+
+
+def averages(sums, n):
+    """Turns sums of `n` pixels into averages.
+
+    The result is identical to that of `cv2.reduce` with `cv2.REDUCE_AVG`
+    on an 8-bit image: the sums are multiplied by `1 / n` in single precision
+    and rounded half to even.
+    """
+
+    return np.rint(sums.astype(np.float32) * np.float32(1 / n)).astype(np.uint8)
+
+
+def getInkX(imgIn, left, top, right, bottom, imgOut=None, integral=None):
     """Make a horizontal histogram of an input region of interest.
 
     Optionally draw the histograms on the corresponding roi of an output image.
@@ -158,6 +292,9 @@ def getInkX(imgIn, left, top, right, bottom, imgOut=None):
         Region of interest on input and output image.
     imgOut: np array, optional `None`
         Output image.
+    integral: np array, optional `None`
+        The integral image of the input image, see `getIntegral`.
+        If given, the histogram is read off from it.
 
     Returns
     -------
@@ -165,34 +302,126 @@ def getInkX(imgIn, left, top, right, bottom, imgOut=None):
         The X histogram
     """
 
-    roiIn = imgIn[top:bottom, left:right]
-    histX = cv2.reduce(roiIn, 0, cv2.REDUCE_AVG).reshape(-1)
+    if integral is None:
+        roiIn = imgIn[top:bottom, left:right]
+        histX = cv2.reduce(roiIn, 0, cv2.REDUCE_AVG).reshape(-1)
+    else:
+        histX = averages(integralCols(integral, left, top, right, bottom), bottom - top)
     if imgOut is not None:
         roiOut = imgOut[top:bottom, left:right]
-        for (i, val) in enumerate(histX):
-            color = (int(val), int(2 * val), int(val))
-            index = (i, 0)
-            value = (i, val)
-            cv2.line(roiOut, index, value, color, 1)
+        drawHist(roiOut, histX, True)
 
     return histX
 
 
-def firstNonzero(arr, axis=None):
-    return (arr != 0).argmax(axis=axis or 0)
+def drawHist(imgOut, hist, vertical, offset=0):
+    """Draws a histogram on an image.
+
+    Each value of the histogram is drawn as a bar of one pixel wide, from
+    `offset` to `offset + value`, in a color that depends on the value.
+
+    The result is the same as drawing each bar with `cv2.line`,
+    but we do it in a few array operations instead of a call per bar.
+
+    Parameters
+    ----------
+    imgOut: np array
+        Output image, colored.
+    hist: np array
+        The histogram, with as many values as the image has columns
+        (if `vertical`) or rows (otherwise).
+    vertical: boolean
+        Whether the bars are vertical, pointing down,
+        or horizontal, pointing right.
+    offset: int, optional 0
+        Where the bars start.
+    """
+
+    hist = np.asarray(hist, dtype=np.uint8)
+    n = len(hist)
+    end = min(imgOut.shape[0 if vertical else 1], offset + int(hist.max(initial=0)) + 1)
+    if end <= offset:
+        return
+
+    # the colors are computed in 8 bits, as they have always been,
+    # so the green component wraps around for values above 127
 
+    colors = np.stack((hist, 2 * hist, hist), axis=1)
+    size = end - offset
+    reach = np.arange(size)
 
-def lastNonzero(arr, axis=None):
-    ax = axis or 0
-    mask = arr != 0
-    ln = arr.shape[ax]
-    val = ln - np.flip(mask, axis=ax or 0).argmax(axis=ax) - 1
-    return val if axis is None else np.where(mask.any(axis=ax), val, -1)
+    # we stretch the colors to bars by resizing, and copy them to the image
+    # through a mask that has the length of each bar
+
+    if vertical:
+        region = imgOut[offset:end]
+        mask = reach[:, None] <= hist[None, :]
+        bars = cv2.resize(
+            colors[None, :, :], (n, size), interpolation=cv2.INTER_NEAREST
+        )
+    else:
+        region = imgOut[:, offset:end]
+        mask = hist[:, None] >= reach[None, :]
+        bars = cv2.resize(
+            colors[:, None, :], (size, n), interpolation=cv2.INTER_NEAREST
+        )
 
+    region[...] = cv2.copyTo(bars, mask.view(np.uint8), region)
 
-def getHist(C, imgIn, lineHeight):
+
+def drawContour(imgOut, contour, faze, color):
+    """Draws a contour on an image.
+
+    A contour has an x coordinate for each row of the image.
+    Each point is drawn as a filled square around it, with sides of `2 * faze + 1`.
+
+    The result is the same as drawing each square with `cv2.rectangle`,
+    but we do it by dilating an image of the points, instead of a call per point.
+
+    Parameters
+    ----------
+    imgOut: np array
+        Output image.
+    contour: np array
+        The x coordinates, one for each row.
+    faze: int
+        Half of the size of the squares.
+    color: tuple
+        The color of the squares.
+    """
+
+    (h, w) = imgOut.shape[0:2]
+    xs = np.asarray(contour)[0:h]
+    ys = np.arange(len(xs))
+
+    # we only work in the columns that the squares can reach
+    # (they may reach into the image from points just outside it)
+
+    inside = (xs + faze >= 0) & (xs - faze < w)
+    if not inside.any():
+        return
+    (xs, ys) = (xs[inside], ys[inside])
+    xMin = max(int(xs.min()) - faze, 0)
+    xMax = min(int(xs.max()) + faze + 1, w)
+
+    canvas = np.zeros((h, xMax - xMin + 2 * faze), dtype=np.uint8)
+    canvas[ys, xs - xMin + faze] = 255
+
+    size = 2 * faze + 1
+    squares = cv2.dilate(canvas, np.ones((size, size), dtype=np.uint8))
+    region = imgOut[:, xMin:xMax]
+    pixel = np.array([[color]], dtype=region.dtype)
+    fill = cv2.resize(pixel, (xMax - xMin, h), interpolation=cv2.INTER_NEAREST)
+    region[...] = cv2.copyTo(fill, squares[:, faze:-faze], region)
+
+
+def getHist(C, imgIn, lineHeight, sums=None):
     if lineHeight is None:
-        return cv2.reduce(imgIn, 1, cv2.REDUCE_AVG).reshape(-1)
+        return (
+            cv2.reduce(imgIn, 1, cv2.REDUCE_AVG).reshape(-1)
+            if sums is None
+            else averages(sums, imgIn.shape[1])
+        )
 
     contourFactor = C.contourFactor
     contourOffset = C.contourOffset
@@ -200,8 +429,25 @@ def getHist(C, imgIn, lineHeight):
     (h, w) = imgIn.shape[0:2]
     increase = int(round(w * contourOffset))
 
-    left = firstNonzero(imgIn, axis=1)
-    right = lastNonzero(imgIn, axis=1)
+    # a single pass over the image gives the amount of ink per row,
+    # and hence also which rows have ink at all;
+    # the caller may have these sums already
+
+    rowSums = (
+        cv2.reduce(imgIn, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S).reshape(-1)
+        if sums is None
+        else sums
+    )
+    hasInk = rowSums > 0
+
+    # the left contour is the first ink pixel in each row.
+    # For the right contour we need the last one: searching a reversed view
+    # is much slower than searching a flipped copy.
+
+    mask = imgIn != 0
+    left = mask.argmax(axis=1)
+    flipped = cv2.flip(mask.view(np.uint8), 1).view(bool)
+    right = np.where(hasInk, w - 1 - flipped.argmax(axis=1), -1)
 
     left[left > increase] -= increase
     right[(0 < right) & (right < w - increase)] += increase
@@ -209,7 +455,8 @@ def getHist(C, imgIn, lineHeight):
     # smooth the left and right contours by taking the median value
     # of a range around each value.
     # the range stretches a fraction of the peak distance to each side
-    # we use a median filter from scipy for it
+    # we use a median filter from scipy for it, padded with zeros;
+    # it updates the median incrementally while the window slides
 
     windowSize = int(round(lineHeight * contourFactor))
     if not windowSize % 2:
@@ -217,18 +464,31 @@ def getHist(C, imgIn, lineHeight):
     if windowSize > h:
         windowSize = h - (0 if h % 2 else 1)
     if windowSize > 1:
-        left = np.rint(medfilt(left, kernel_size=windowSize)).astype(int)
-        right = np.rint(medfilt(right, kernel_size=windowSize)).astype(int)
+        left = median_filter(left, size=windowSize, mode="constant")
+        right = median_filter(right, size=windowSize, mode="constant")
 
-    lengths = np.transpose(right - left + 1)
+    lengths = right - left + 1
 
-    histY = np.sum(imgIn, axis=1).astype(float)
+    histY = rowSums.astype(float)
     histY[lengths > 0] = histY[lengths > 0] / lengths[lengths > 0]
     histY[histY > 200] = 200
     return (np.rint(histY).astype(np.uint8), left, right)
 
 
-def getInkY(C, info, imgIn, pageH, left, top, right, bottom, final, imgOut=None):
+def getInkY(
+    C,
+    info,
+    imgIn,
+    pageH,
+    left,
+    top,
+    right,
+    bottom,
+    final,
+    imgOut=None,
+    integral=None,
+    prior=None,
+):
     """Determine the line distribution in a block of text.
 
     Optionally draw the histogram and the peaks and valleys
@@ -238,7 +498,11 @@ def getInkY(C, info, imgIn, pageH, left, top, right, bottom, final, imgOut=None)
     and the distances between them.
 
     But if we have just one peak, we do not have distances.
-    In those cases, we take the last line height that has been calculated.
+    In those cases, we take the line height prior of the book, if there is one,
+    and otherwise the setting `defaultLineHeight`.
+
+    If there is a line height prior, we also use it instead of the rough
+    estimate of the line height on the raw histogram, see `linePrior`.
 
     Parameters
     ----------
@@ -260,6 +524,11 @@ def getInkY(C, info, imgIn, pageH, left, top, right, bottom, final, imgOut=None)
         generated by these calls.
     imgOut: np array, optional `None`
         Output image.
+    integral: np array, optional `None`
+        The integral image of the input image, see `getIntegral`.
+        If given, the sums of the rows are read off from it.
+    prior: int, optional `None`
+        The line height prior of the book, see `linePrior`.
 
     Returns
     -------
@@ -283,7 +552,7 @@ def getInkY(C, info, imgIn, pageH, left, top, right, bottom, final, imgOut=None)
     peakProminence = C.peakProminenceY
     valleyProminence = C.valleyProminenceY
     outerValleyShiftFraction = C.outerValleyShiftFraction
-    defaultLineHeight = C.defaultLineHeight
+    defaultLineHeight = C.defaultLineHeight if prior is None else prior
 
     peakDistance = int(round(pageH / 45))
 
@@ -295,9 +564,9 @@ def getInkY(C, info, imgIn, pageH, left, top, right, bottom, final, imgOut=None)
     (normH, normW) = (bottom - top, right - left)
 
     roiIn = imgIn[top:bottom, left:right]
-
-    # the raw histogram
-    histY = getHist(C, roiIn, None)
+    sums = (
+        None if integral is None else integralRows(integral, left, top, right, bottom)
+    )
 
     # estimate the lineheight based on the raw histogram
 
@@ -336,14 +605,20 @@ def getInkY(C, info, imgIn, pageH, left, top, right, bottom, final, imgOut=None)
         # remaining distances: that is the line height
         return pureAverage(np.array(diffPeaks), defaultLineHeight)
 
-    lineHeight = getLineHeight(histY, show=False)
-    if lineHeight is None:
-        # no lines
-        return []
+    if prior is None:
+        # the raw histogram
+        histY = getHist(C, roiIn, None, sums=sums)
+        lineHeight = getLineHeight(histY, show=False)
+        if lineHeight is None:
+            # no lines
+            return []
+    else:
+        # the other pages of the book give a better estimate than the raw histogram
+        lineHeight = prior
 
     # compute a better histogram, based on smooth contour lines
     # Crucial: the contour computation is based on the estimated line height
-    (histY, leftContour, rightContour) = getHist(C, roiIn, lineHeight)
+    (histY, leftContour, rightContour) = getHist(C, roiIn, lineHeight, sums=sums)
     lineHeight = getLineHeight(histY, show=show)
     if lineHeight is None:
         # no lines
@@ -474,19 +749,9 @@ def getInkY(C, info, imgIn, pageH, left, top, right, bottom, final, imgOut=None)
     if imgOut is not None:
         roiOut = imgOut[top:bottom, left:right]
         faze = 5
-        for (i, val) in enumerate(leftContour):
-            tl = (max((val - faze, 0)), max((i - faze, 0)))
-            br = (min((val + faze, right)), min((i + faze, bottom)))
-            cv2.rectangle(roiOut, tl, br, orange, -1)
-        for (i, val) in enumerate(rightContour):
-            tl = (max((val - faze, 0)), max((i - faze, 0)))
-            br = (min((val + faze, right)), min((i + faze, bottom)))
-            cv2.rectangle(roiOut, tl, br, purple, -1)
-        for (i, val) in enumerate(histY):
-            color = (int(val), int(2 * val), int(val))
-            index = (sqDWidth + 10, i)
-            value = (sqDWidth + 10 + val, i)
-            cv2.line(roiOut, index, value, color, 1)
+        drawContour(roiOut, leftContour, faze, orange)
+        drawContour(roiOut, rightContour, faze, purple)
+        drawHist(roiOut, histY, False, offset=sqDWidth + 10)
         for e in valleys:
             index = (0, max((e - sqHWidth, 0)))
             value = (sqWidth, min((e + sqHWidth, len(histY) - 1)))
@@ -495,12 +760,14 @@ def getInkY(C, info, imgIn, pageH, left, top, right, bottom, final, imgOut=None)
             index = (sqWidth, max((e - sqHWidth, 0)))
             value = (sqDWidth, min((e + sqHWidth, len(histY) - 1)))
             cv2.rectangle(roiOut, index, value, green, -1)
+        regions = []
         for (up, lo) in lines:
-            overlay(roiOut, 14, up, normW - 14, up + 3, white, upperColor)
-            overlay(roiOut, 14, lo - 3, normW - 14, lo, white, lowerColor)
+            regions.append((14, up, normW - 14, up + 3, upperColor))
+            regions.append((14, lo - 3, normW - 14, lo, lowerColor))
         for (lo, up) in zip(
             (0, *(x[1] for x in lines)), (*(x[0] for x in lines), normH)
         ):
-            overlay(roiOut, 14, lo, normW - 14, up + 1, white, mColor)
+            regions.append((14, lo, normW - 14, up + 1, mColor))
+        overlayMany(roiOut, regions, white)
 
     return lines
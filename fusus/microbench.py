@@ -0,0 +1,488 @@
+"""Micro-benchmarks of the hot helper functions.
+
+Some helper functions are called thousands of times per book.
+Here we measure them in isolation, so that an optimization of one of them
+can be evaluated without running the whole pipeline.
+
+``` sh
+python3 -m fusus.microbench
+python3 -m fusus.microbench clean.cluster lib.overlay
+```
+
+The benchmarks are also part of the benchmark suite, as the group `micro`,
+see `fusus.bench`.
+
+## Fixtures
+
+The inputs of the functions are captured from real pages when the benchmarks
+start: a few pages of the `example` book are run through the layout step
+(`FIXTURE_PAGES`), and from the results we take
+
+*   the normalized page images (`layout.getStretches`);
+*   the blurred images and the regions of the blocks (`lines.getInkY`,
+    `lines.getHist`, `lib.getMargins`), also with the integral image of the
+    blurred image (`lines.getInkY.integral`);
+*   the blurred images and the region that spans all blocks of a page,
+    as the tallest block that can occur (`lines.getHist.tall`);
+*   the regions between the lines of the blocks, one by one (`lib.overlay`)
+    and all regions of a block at once (`lib.overlayMany`);
+*   the match maps of the mark templates on the lines of the blocks and
+    the hits in them (`clean.cluster`, `clean.connected`).
+
+We also measure the processing of these pages as a whole, without OCR,
+in batch mode (`Book._doPage`) and in batch mode with boxed output
+(`Book._doPage.boxed`).
+Here the memory per call shows how much image data a page needs at its peak.
+
+For `fusus.lakhnawi.Lakhnawi.trimLine` and `fusus.lakhnawi.Lakhnawi.clusterVert`
+we record the character data with which these methods are called when
+the pages `LAKHNAWI_PAGES` of the Lakhnawi PDF are extracted.
+These benchmarks are skipped if the PDF is not present.
+
+## Measurements
+
+Per function we report
+
+*   the number of operations per second: calls are repeated over all fixtures
+    until at least `MIN_TIME` seconds have been spent, and that is done
+    a number of times; we take the median;
+*   the memory allocated per call: the peak of the memory traced by
+    `tracemalloc` during a call, above the level before the call,
+    averaged over the fixtures.
+
+The preparation of the inputs of a call, such as copying an image that is
+modified by the call, is not measured.
+"""
+
+import sys
+import os
+import io
+import time
+import shutil
+import statistics
+import tempfile
+import tracemalloc
+from copy import deepcopy
+from functools import partial
+from contextlib import redirect_stdout
+
+import cv2
+import numpy as np
+
+from .lib import imageFileList, select, getMargins, overlay, overlayMany
+from .clean import cluster, connected
+from .layout import getStretches
+from .lines import getHist, getIntegral, getInkX, getInkY
+from .bench import PIPELINE, REPEAT, copyBook, durRep
+
+
+__pdoc__ = {}
+
+HELP = """
+Run micro-benchmarks of the hot helper functions.
+
+python3 -m fusus.microbench --help
+python3 -m fusus.microbench [name ...]
+
+--help: print this text and exit
+
+name        : run only the benchmarks of these functions, e.g.
+                clean.cluster
+                lib.overlay
+              default: all functions
+"""
+"""Help"""
+
+__pdoc__["HELP"] = f"``` text\n{HELP}\n```"
+
+FIXTURE_PAGES = "47-48,58-59"
+"""The pages of the `example` book from which we capture fixtures."""
+
+LAKHNAWI_PAGES = "100-102"
+"""The pages of the Lakhnawi PDF from which we capture fixtures."""
+
+MAX_FIXTURES = 200
+"""The maximum number of fixtures per function."""
+
+MIN_TIME = 0.5
+"""The minimum time in seconds that a function is measured per round."""
+
+
+def quiet(*args, **kwargs):
+    pass
+
+
+def keep(fixtures, args):
+    if len(fixtures) < MAX_FIXTURES:
+        fixtures.append(args)
+
+
+def capturePages(workDir, pages=FIXTURE_PAGES):
+    """Captures fixtures from pages of the example book.
+
+    Parameters
+    ----------
+    workDir: string
+        An empty directory to which the pages are copied.
+        The book is processed there, so it has to stay until the benchmarks
+        of whole pages are done.
+    pages: string, optional `FIXTURE_PAGES`
+        The pages to run through the layout step.
+
+    Returns
+    -------
+    tuple
+        The `fusus.book.Book` object (or `None` if there are no pages)
+        and a dict keyed by function name, valued by a list of argument tuples.
+    """
+
+    from .book import Book
+
+    srcDir = PIPELINE["example"]["dir"]
+    inDir = f"{srcDir}/in"
+    if not os.path.exists(inDir):
+        print(f"No fixtures: no page images in {inDir}")
+        return (None, {})
+
+    pageFiles = select(imageFileList(inDir), pages)
+    cwd = os.getcwd()
+
+    fixtures = {
+        name: []
+        for name in (
+            "layout.getStretches",
+            "lines.getInkY",
+            "lines.getInkY.integral",
+            "lines.getHist",
+            "lines.getHist.tall",
+            "lib.getMargins",
+            "lib.overlay",
+            "lib.overlayMany",
+            "clean.cluster",
+            "clean.connected",
+        )
+    }
+    fixtures["Book._doPage"] = [(f,) for f in pageFiles]
+    fixtures["Book._doPage.boxed"] = [(f,) for f in pageFiles]
+
+    try:
+        copyBook(srcDir, pageFiles, workDir)
+        with redirect_stdout(io.StringIO()):
+            B = Book(cd=workDir)
+        C = B.C
+        white = C.whiteRGB
+        mColor = C.marginRGB
+
+        for f in pageFiles:
+            with redirect_stdout(io.StringIO()):
+                page = B._doPage(f, batch=True, quiet=True, uptoLayout=True)
+            if page.empty:
+                continue
+
+            stages = page.stages
+            (pageH, pageW) = stages["normalized"].shape[0:2]
+            normalized = dict(normalized=stages["normalized"])
+            dest = fixtures["layout.getStretches"]
+            keep(dest, (C, quiet, normalized, pageW, True, True))
+            keep(dest, (C, quiet, normalized, pageH, False, True))
+
+            blurred = stages["blurred"]
+            integral = getIntegral(blurred)
+            demargined = stages["demargined"]
+            colored = cv2.cvtColor(stages["normalized"], cv2.COLOR_GRAY2BGR)
+            pageHeights = []
+            pageRegions = []
+
+            for data in page.blocks.values():
+                (left, top, right, bottom) = data["inner"]
+                if bottom <= top or right <= left:
+                    continue
+                (normH, normW) = (bottom - top, right - left)
+                roi = blurred[top:bottom, left:right]
+                lines = data.get("bands", {}).get("main", {}).get("lines", [])
+                heights = [lines[i][0] - lines[i - 1][0] for i in range(1, len(lines))]
+                lineHeight = int(np.median(heights)) if heights else C.defaultLineHeight
+                pageHeights.extend(heights)
+                pageRegions.append((left, top, right, bottom))
+
+                keep(
+                    fixtures["lines.getInkY"],
+                    (C, quiet, blurred, pageH, left, top, right, bottom, True),
+                )
+                keep(
+                    fixtures["lines.getInkY.integral"],
+                    (C, quiet, blurred, pageH, left, top, right, bottom, True)
+                    + (None, integral),
+                )
+                keep(fixtures["lines.getHist"], (C, roi, None))
+                keep(fixtures["lines.getHist"], (C, roi, lineHeight))
+                histX = getInkX(blurred, left, top, right, bottom)
+                keep(fixtures["lib.getMargins"], (histX, normW, C.marginThresholdX))
+
+                region = colored[top:bottom, left:right]
+                regions = []
+                for (upper, lower) in zip(
+                    (0, *(x[1] for x in lines)), (*(x[0] for x in lines), normH)
+                ):
+                    keep(
+                        fixtures["lib.overlay"],
+                        (region, 14, upper, normW - 14, lower + 1, white, mColor),
+                    )
+                    regions.append((14, upper, normW - 14, lower + 1, mColor))
+                keep(fixtures["lib.overlayMany"], (region, regions, white))
+
+                if "bands" not in data:
+                    continue
+
+                thisDemargined = demargined[top:bottom, left:right]
+                for (band, markData) in B.marks.items():
+                    bandLines = data["bands"][band]["lines"]
+                    for markInfo in markData.values():
+                        mark = markInfo["gray"]
+                        (markH, markW) = mark.shape[:2]
+                        for (up, lo) in bandLines:
+                            roi = thisDemargined[up : lo + 1]
+                            (roiH, roiW) = roi.shape[:2]
+                            if roiH < markH or roiW < markW:
+                                continue
+                            result = cv2.matchTemplate(
+                                roi, mark, cv2.TM_CCOEFF_NORMED
+                            )
+                            pts = list(zip(*np.where(result >= markInfo["accuracy"])))
+                            if not pts:
+                                continue
+                            keep(fixtures["clean.cluster"], (pts, result))
+                            for (pt, value) in cluster(pts, result):
+                                keep(
+                                    fixtures["clean.connected"],
+                                    (
+                                        markH,
+                                        markW,
+                                        markInfo["connectBorder"],
+                                        C.connectThreshold,
+                                        roi,
+                                        pt,
+                                    ),
+                                )
+
+            if pageRegions:
+                (lefts, tops, rights, bottoms) = zip(*pageRegions)
+                roi = blurred[min(tops) : max(bottoms), min(lefts) : max(rights)]
+                lineHeight = (
+                    int(np.median(pageHeights)) if pageHeights else C.defaultLineHeight
+                )
+                keep(fixtures["lines.getHist.tall"], (C, roi, lineHeight))
+    finally:
+        os.chdir(cwd)
+
+    return (B, fixtures)
+
+
+def captureLakhnawi(pages=LAKHNAWI_PAGES):
+    """Captures the arguments of the hot methods of the Lakhnawi text extraction.
+
+    Parameters
+    ----------
+    pages: string, optional `LAKHNAWI_PAGES`
+        The pages of the PDF to extract.
+
+    Returns
+    -------
+    tuple
+        The `fusus.lakhnawi.Lakhnawi` object and a dict keyed by method name,
+        valued by a list of argument tuples.
+        If the PDF is not present, the object is `None` and the dict is empty.
+    """
+
+    from .lakhnawi import SOURCE, Lakhnawi
+
+    if not os.path.exists(SOURCE):
+        print(f"Skipping the Lakhnawi benchmarks: no PDF at {SOURCE}")
+        return (None, {})
+
+    fixtures = {"Lakhnawi.trimLine": [], "Lakhnawi.clusterVert": []}
+
+    with redirect_stdout(io.StringIO()):
+        Lw = Lakhnawi()
+
+    def recorder(name, method):
+        def record(*args):
+            keep(fixtures[name], deepcopy(args))
+            return method(*args)
+
+        return record
+
+    Lw.trimLine = recorder("Lakhnawi.trimLine", Lw.trimLine)
+    Lw.clusterVert = recorder("Lakhnawi.clusterVert", Lw.clusterVert)
+
+    try:
+        with redirect_stdout(io.StringIO()):
+            Lw.getPages(pages)
+    finally:
+        del Lw.trimLine
+        del Lw.clusterVert
+
+    return (Lw, fixtures)
+
+
+def measure(func, fixtures, setup=None, repeat=REPEAT, minTime=MIN_TIME):
+    """Measures a function over a list of fixtures.
+
+    Parameters
+    ----------
+    func: function
+        The function to measure.
+    fixtures: list of tuple
+        The arguments of the calls.
+    setup: function, optional `None`
+        If given, it is applied to each fixture to produce the actual arguments
+        of a call. Its own time is not measured.
+        Use it if the function modifies its arguments.
+    repeat: int, optional `REPEAT`
+        The number of rounds.
+    minTime: float, optional `MIN_TIME`
+        The minimum time spent in the function per round.
+
+    Returns
+    -------
+    dict
+        The result of the measurement.
+    """
+
+    clock = time.perf_counter
+    rates = []
+
+    for r in range(repeat):
+        n = 0
+        elapsed = 0
+        while elapsed < minTime:
+            for args in fixtures:
+                if setup is not None:
+                    args = setup(args)
+                start = clock()
+                func(*args)
+                elapsed += clock() - start
+            n += len(fixtures)
+        rates.append(n / elapsed)
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for args in fixtures:
+            if setup is not None:
+                args = setup(args)
+            tracemalloc.reset_peak()
+            (before, peak) = tracemalloc.get_traced_memory()
+            func(*args)
+            (after, peak) = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+    finally:
+        tracemalloc.stop()
+
+    opsPerSecond = statistics.median(rates)
+    return dict(
+        opsPerSecond=round(opsPerSecond, 1),
+        wall=1 / opsPerSecond,
+        fixtures=len(fixtures),
+        allocBytes=int(round(statistics.mean(peaks))),
+        maxAllocBytes=max(peaks),
+        rates=[round(rate, 1) for rate in rates],
+    )
+
+
+def copyImage(args):
+    (img, *rest) = args
+    return (img.copy(), *rest)
+
+
+def benchMicro(results, repeat=REPEAT, names=None):
+    """Runs the micro-benchmarks.
+
+    Parameters
+    ----------
+    results: dict
+        The results are added to this dict, keyed by `micro/` plus the name of
+        the function.
+    repeat: int, optional `REPEAT`
+        The number of rounds per function.
+    names: iterable of string, optional `None`
+        If given, only the functions with these names are measured.
+    """
+
+    def wanted(name):
+        return names is None or name in names
+
+    workDir = tempfile.mkdtemp(prefix="fusus-microbench-")
+    cwd = os.getcwd()
+
+    try:
+        (B, fixtures) = capturePages(workDir)
+        functions = {
+            "clean.cluster": (cluster, None),
+            "clean.connected": (connected, None),
+            "layout.getStretches": (getStretches, None),
+            "lines.getHist": (getHist, None),
+            "lines.getHist.tall": (getHist, None),
+            "lines.getInkY": (getInkY, None),
+            "lines.getInkY.integral": (getInkY, None),
+            "lib.getMargins": (getMargins, None),
+            "lib.overlay": (overlay, copyImage),
+            "lib.overlayMany": (overlayMany, copyImage),
+        }
+        if B is not None:
+            # the book is processed in its own directory
+            os.chdir(workDir)
+            doPage = partial(B._doPage, batch=True, quiet=True, doOcr=False)
+            functions["Book._doPage"] = (partial(doPage, boxed=False), None)
+            functions["Book._doPage.boxed"] = (partial(doPage, boxed=True), None)
+        measureAll(results, functions, fixtures, repeat, wanted)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workDir, ignore_errors=True)
+
+    if wanted("Lakhnawi.trimLine") or wanted("Lakhnawi.clusterVert"):
+        (Lw, lwFixtures) = captureLakhnawi()
+        if Lw is not None:
+            functions = {
+                "Lakhnawi.trimLine": (Lw.trimLine, deepcopy),
+                "Lakhnawi.clusterVert": (Lw.clusterVert, deepcopy),
+            }
+            measureAll(results, functions, lwFixtures, repeat, wanted)
+
+
+def measureAll(results, functions, fixtures, repeat, wanted):
+    for (name, (func, setup)) in functions.items():
+        if not wanted(name):
+            continue
+        theseFixtures = fixtures.get(name, [])
+        if not theseFixtures:
+            print(f"micro/{name}: skipped: no fixtures")
+            continue
+        with redirect_stdout(io.StringIO()):
+            result = measure(func, theseFixtures, setup=setup, repeat=repeat)
+        results[f"micro/{name}"] = result
+        print(
+            f"micro/{name:<28} {result['opsPerSecond']:>12.1f} ops/s"
+            f" {durRep(result['wall'])}/op"
+            f" {result['allocBytes'] / 1024:>10.1f} KB/op"
+            f" ({len(theseFixtures)} fixtures)"
+        )
+
+
+def main():
+    """Perform tasks.
+
+    See `HELP`.
+    """
+
+    args = () if len(sys.argv) == 1 else tuple(sys.argv[1:])
+    if "--help" in args:
+        print(HELP)
+        return True
+
+    benchMicro({}, names=set(args) if args else None)
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
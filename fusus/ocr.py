@@ -16,7 +16,10 @@ Alternatively, we can do binarization and segmentation in our preprocessing, and
 use Kraken for OCR only.
 """
 
+import os
+import json
 import warnings
+import heapq
 from itertools import chain
 
 from IPython.display import display, HTML
@@ -30,69 +33,21 @@ from tf.core.helpers import unexpanduser
 
 from .char import UChar
 from .lib import DEFAULT_EXTENSION
+from .template import Template
 
 
 RL = "horizontal-rl"
 TEMPLATE = dict(
-    line="""\
-<div
-    class="l"
-    style="
-        left: «left»px;
-        top: «top»px;
-        width: «width»px;
-        height: «height»px;
-    "
->
-    <span class="n">«text»</span>
-</div>
-""",
-    word="""\
-<div
-    class="w"
-    style="
-        left: «left»px;
-        top: «top»px;
-        width: «width»px;
-        height: «height»px;
-        background-color: «background»;
-    "
->
-    <span class="a">«text»</span>
-</div>
-""",
-    char="""\
-<div
-    class="c"
-    style="
-        left: «left»px;
-        top: «top»px;
-        width: «width»px;
-        height: «height»px;
-        background-color: «background»;
-    "
->
-    <span class="b">«text»</span>
-</div>
-""",
-    doc="""\
-<html>
-  <head>
-  <meta charset="utf-8"/>
-<style>
+    css=Template(
+        """\
 body {
   position: absolute;
-  width: «width»px;
-  height: «height»px;
 }
 div.page {
   position: absolute;
-  width: «width»px;
-  height: «height»px;
 }
 .img {
   position: absolute;
-  width: «width»px;
 }
 .l {
   position: absolute;
@@ -142,19 +97,86 @@ div.page {
   color: #4400bb;
   vertical-align: top;
 }
-</style>
+"""
+    ),
+    js=Template(
+        """\
+const COLORS = «colors»
+
+const esc = text =>
+  text.replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/>/g, "&gt;")
+
+const proof = () => {
+  const data = JSON.parse(document.getElementById("proofdata").textContent)
+  const { level, source, width, height, lines, boxes } = data
+  const scale = width == 0 ? 1 : 1000 / width
+  const g = m => (scale == 1 ? m : Math.round(m * scale))
+  const [boxClass, textClass] = level == "char" ? ["c", "b"] : ["w", "a"]
+
+  const pageWidth = `${g(width)}px`
+  const pageHeight = `${g(height)}px`
+  const page = document.querySelector("div.page")
+  for (const elem of [document.body, page]) {
+    elem.style.width = pageWidth
+    elem.style.height = pageHeight
+  }
+
+  const html = [
+    `<img class="img" style="left: 0; top: 0; width: ${pageWidth};" src="${source}">`,
+  ]
+  for (const [left, top, right, bottom, ln] of lines) {
+    html.push(
+      `<div class="l" style="left: ${g(left)}px; top: ${g(top)}px;` +
+        ` width: ${g(right - left)}px; height: ${g(bottom - top)}px;">` +
+        `<span class="n">${ln}</span></div>`
+    )
+  }
+  for (const [left, top, right, bottom, conf, text] of boxes) {
+    const color = COLORS[Math.max(0, Math.min(COLORS.length - 1, conf))]
+    html.push(
+      `<div class="${boxClass}" style="left: ${g(left)}px; top: ${g(top)}px;` +
+        ` width: ${g(right - left)}px; height: ${g(bottom - top)}px;` +
+        ` background-color: ${color};">` +
+        `<span class="${textClass}">${esc(text)}</span></div>`
+    )
+  }
+  page.innerHTML = html.join("")
+}
+"""
+    ),
+    doc=Template(
+        """\
+<html>
+  <head>
+  <meta charset="utf-8"/>
+  <link rel="stylesheet" href="«css»"/>
+  <script src="«js»"></script>
   </head>
-<body>
-  <div class="page">
-    <img class="img" style="left: 0; top: 0;" src="«source»">
-    «lines»
-    «boxes»
-  </div>
+<body onload="proof()">
+  <div class="page"></div>
+<script type="application/json" id="proofdata">
+«data»
+</script>
 </body>
 </html>
-""",
+"""
+    ),
 )
+"""Templates for proof pages.
 
+A proof page is a small HTML document per page and per level (*word* or *char*)
+that contains the OCR results of that page as compact JSON.
+
+The markup of the boxes is generated in the browser by a script
+that is shared by all proof pages of a book, as is the style sheet.
+These shared files are written next to the proof pages.
+"""
+
+WORST_EXAMPLES = 20
+"""How many of the worst results per character are shown in quality reports."""
+
+PROOF_CSS = "proof.css"
+PROOF_JS = "proof.js"
 
 CONF_COLOR = (
     (0, 50, 0, 10, 30, 40, 0.6, 0.6),
@@ -255,6 +277,55 @@ def showConf(stage, results, label="notes"):
     display(HTML(html))
 
 
+def qualitySummary(chars, words, worst=WORST_EXAMPLES):
+    """Summarizes the confidences of the OCR results of a page.
+
+    These summaries can be combined over many pages without looking at
+    the individual results again, see `fusus.book.Book.measureQuality`.
+
+    Parameters
+    ----------
+    chars: list of tuple
+        The OCR results of a page at character level.
+    words: list of tuple
+        The OCR results of a page at word level.
+    worst: int, optional `WORST_EXAMPLES`
+        How many of the lowest confidences we keep per character.
+
+    Returns
+    -------
+    dict
+        Under keys `char` and `word` the number of results, and the minimum,
+        maximum and total of their confidences.
+        Under key `chars` the same per character, plus the lowest
+        confidences of that character on this page, in ascending order,
+        under key `worst`.
+    """
+
+    def stats(confs):
+        return dict(
+            n=len(confs),
+            min=min(confs, default=100),
+            max=max(confs, default=0),
+            total=sum(confs),
+        )
+
+    confsChar = {}
+    for fields in chars:
+        confsChar.setdefault(fields[-1], []).append(int(fields[-2]))
+
+    perChar = {}
+    for (c, confs) in confsChar.items():
+        perChar[c] = stats(confs)
+        perChar[c]["worst"] = heapq.nsmallest(worst, confs)
+
+    return dict(
+        char=stats([int(fields[-2]) for fields in chars]),
+        word=stats([int(fields[-3]) for fields in words]),
+        chars=perChar,
+    )
+
+
 class OCR(UChar):
     def __init__(self, engine):
         """Sets up OCR with Kraken."""
@@ -281,14 +352,32 @@ class OCR(UChar):
             self.model = model
         return self.model
 
-    def read(self, page):
-        """Perfoms OCR with Kraken."""
+    def read(self, page, outputs=None):
+        """Perfoms OCR with Kraken.
+
+        Parameters
+        ----------
+        page: object
+            The `fusus.page.Page` to read.
+        outputs: set of string, optional `None`
+            The stages that are needed, e.g. the stages of the output profile,
+            see `fusus.parameters.OUTPUT_PROFILES`.
+            The `char`, `line` and `quality` data are only made if they
+            are in this set; the `word` data are always made.
+            If `None`, all of them are made.
+        """
+
+        doQuality = outputs is None or "quality" in outputs
+        doChars = doQuality or "char" in outputs
+        doLines = outputs is None or "line" in outputs
 
         stages = page.stages
         scan = stages.get("clean", None)
         if scan is None:
             return None
 
+        engine = self.engine
+        span = engine.profiler.span
         nonLetter = self.nonLetter
 
         model = self.ensureLoaded()
@@ -297,9 +386,13 @@ class OCR(UChar):
         ocrChars = []
         ocrWords = []
         ocrLines = []
-        stages["char"] = ocrChars
+        nChars = 0
+        nLines = 0
+        if doChars:
+            stages["char"] = ocrChars
         stages["word"] = ocrWords
-        stages["line"] = ocrLines
+        if doLines:
+            stages["line"] = ocrLines
         binary = pil2array(nlbin(array2pil(scan)))
 
         for ((stripe, block), data) in blocks.items():
@@ -310,7 +403,11 @@ class OCR(UChar):
                 lln = ln + 1
                 roi = thisBinary[up : lo + 1]
                 (b, e, roi) = removeMargins(roi, keep=16)
-                ocrLines.append((stripe, block, lln, left + b, top + up, left + e, top + lo))
+                nLines += 1
+                if doLines:
+                    ocrLines.append(
+                        (stripe, block, lln, left + b, top + up, left + e, top + lo)
+                    )
                 (roiH, roiW) = roi.shape[0:2]
                 roi = array2pil(roi)
                 bounds = dict(boxes=([0, 0, roiW, roiH],), text_direction=RL)
@@ -321,19 +418,20 @@ class OCR(UChar):
                 # See https://github.com/mittagessen/kraken/issues/184
 
                 adaptedPreds = []
-                for (c, (le, to, ri, bo), conf) in chain.from_iterable(
-                    rpred(model, roi, bounds, pad=0, bidi_reordering=True)
-                ):
-                    if adaptedPreds:
-                        prevPred = adaptedPreds[-1]
-                        prevEdge = prevPred[1][0]
-                    else:
-                        prevEdge = roiW
-                    correction = int(round((prevEdge - ri) / 2))
-                    thisRi = ri + correction
-                    if adaptedPreds:
-                        adaptedPreds[-1][1][0] -= correction
-                    adaptedPreds.append([c, [le, to, thisRi, bo], conf])
+                with span("rpred", detail=True, block=f"{stripe}{block}", line=lln):
+                    for (c, (le, to, ri, bo), conf) in chain.from_iterable(
+                        rpred(model, roi, bounds, pad=0, bidi_reordering=True)
+                    ):
+                        if adaptedPreds:
+                            prevPred = adaptedPreds[-1]
+                            prevEdge = prevPred[1][0]
+                        else:
+                            prevEdge = roiW
+                        correction = int(round((prevEdge - ri) / 2))
+                        thisRi = ri + correction
+                        if adaptedPreds:
+                            adaptedPreds[-1][1][0] -= correction
+                        adaptedPreds.append([c, [le, to, thisRi, bo], conf])
                 if adaptedPreds:
                     adaptedPreds[-1][1][0] = 0
 
@@ -347,7 +445,9 @@ class OCR(UChar):
                     offsetH = top + up
                     pos = (le + offsetW, to + offsetH, ri + offsetW, bo + offsetH)
                     conf = int(round(conf * 100))
-                    ocrChars.append((stripe, block, lln, *pos, conf, c))
+                    nChars += 1
+                    if doChars:
+                        ocrChars.append((stripe, block, lln, *pos, conf, c))
 
                     spaceSeen = c == " "
                     changeWord = not inWord and c not in nonLetter
@@ -370,10 +470,43 @@ class OCR(UChar):
                 if curWord[0] or curWord[1]:
                     ocrWords.append((stripe, block, lln, *addWord(curWord)))
 
-        page.write(stage="line,word,char")
+        engine.profiler.count(lines=nLines, words=len(ocrWords), characters=nChars)
+        if doQuality:
+            stages["quality"] = qualitySummary(ocrChars, ocrWords)
+        page.write(stage="line,word,char,quality")
+
+    def proofAssets(self):
+        """Writes the style sheet and script that are shared by all proof pages.
+
+        They are written when they are missing from the current proof directory,
+        so also after that directory has been changed by the settings,
+        or cleared.
+        """
+
+        engine = self.engine
+        C = engine.C
+        proofDir = C.proofDir
+        cssPath = f"{proofDir}/{PROOF_CSS}"
+        jsPath = f"{proofDir}/{PROOF_JS}"
+
+        if os.path.exists(cssPath) and os.path.exists(jsPath):
+            return
+
+        colors = json.dumps([getProofColor(conf) for conf in range(101)])
+
+        with open(cssPath, "w") as f:
+            TEMPLATE["css"].write(f)
+        with open(jsPath, "w") as f:
+            TEMPLATE["js"].write(f, colors=colors)
 
     def proofing(self, page):
-        """Produces an OCR proof page"""
+        """Produces an OCR proof page
+
+        The proof page only contains the OCR data of the page, in compact form.
+        The boxes are rendered by the browser, see `TEMPLATE`.
+        """
+
+        self.proofAssets()
 
         stages = page.stages
 
@@ -383,59 +516,51 @@ class OCR(UChar):
 
         scale = 1 if w == 0 else 1000 / w
 
-        def g(m, asStr=True):
-            scaledM = m if scale == 1 else int(round(m * scale))
-            return str(scaledM) if asStr else scaledM
+        page.proofW = w if scale == 1 else int(round(w * scale))
+        page.proofH = h if scale == 1 else int(round(h * scale))
 
-        page.proofW = g(w, asStr=False)
-        page.proofH = g(h, asStr=False)
+        # the coordinates may be numpy integers, which json cannot handle
 
-        linesHtml = "".join(
-            TEMPLATE["line"]
-            .replace("«left»", g(left))
-            .replace("«top»", g(top))
-            .replace("«width»", g(right - left))
-            .replace("«height»", g(bottom - top))
-            .replace("«text»", f"{ln:>01}")
+        linesData = [
+            (int(left), int(top), int(right), int(bottom), ln)
             for (stripe, block, ln, left, top, right, bottom) in ocrLines
-        )
+        ]
+
+        outputs = self.engine.outputs
 
         for stage in ("char", "word"):
-            stageData = stages.get(stage, [])
-            boxesHtml = []
-            for (
-                stripe,
-                block,
-                ln,
-                left,
-                top,
-                right,
-                bottom,
-                conf,
-                *rest,
-            ) in stageData:
-                boxesHtml.append(
-                    TEMPLATE[stage]
-                    .replace("«left»", g(left))
-                    .replace("«top»", g(top))
-                    .replace("«width»", g(right - left))
-                    .replace("«height»", g(bottom - top))
-                    .replace("«background»", getProofColor(conf))
-                    .replace("«text»", "".join(rest))
-                )
-
-            boxesHtml = "".join(boxesHtml)
-            proofData = (
-                TEMPLATE["doc"]
-                .replace("«width»", g(w))
-                .replace("«height»", g(h))
-                .replace("«source»", f"{page.bare}.{DEFAULT_EXTENSION}")
-                .replace("«lines»", linesHtml)
-                .replace("«boxes»", boxesHtml)
-            )
             proofStage = f"proof{stage}"
+            if outputs is not None and proofStage not in outputs:
+                continue
+            stageData = stages.get(stage, [])
+            boxesData = [
+                (int(left), int(top), int(right), int(bottom), conf, "".join(rest))
+                for (
+                    stripe,
+                    block,
+                    ln,
+                    left,
+                    top,
+                    right,
+                    bottom,
+                    conf,
+                    *rest,
+                ) in stageData
+            ]
+            data = json.dumps(
+                dict(
+                    level=stage,
+                    source=f"{page.bare}.{DEFAULT_EXTENSION}",
+                    width=w,
+                    height=h,
+                    lines=linesData,
+                    boxes=boxesData,
+                ),
+                ensure_ascii=False,
+                separators=(",", ":"),
+            ).replace("</", "<\\/")
             with open(page.stagePath(proofStage), "w") as f:
-                f.write(proofData)
+                TEMPLATE["doc"].write(f, css=PROOF_CSS, js=PROOF_JS, data=data)
             stages[proofStage] = f"see proof at {stage} level"
 
 
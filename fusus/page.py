@@ -17,20 +17,22 @@ from .lib import (
     parseMarks,
     cropBorders,
     removeBorders,
+    overlapping,
+    overlayMany,
     showImage,
     writeImage,
     splitext,
     getNbLink,
 )
 from .clean import addBox, cluster, connected, reborder
-from .lines import getInkDistribution
+from .lines import getInkDistribution, getIntegral
+from .ocr import qualitySummary
 from .layout import (
     applyHRules,
     getBlocks,
     getStretches,
     getStripes,
     grayInterBlocks,
-    overlay,
 )
 
 
@@ -79,9 +81,158 @@ DATA_TYPES = tuple(
 )
 
 
+def readScan(path, grayscale):
+    """Reads a scanned page.
+
+    In batch mode without boxed output no colour stage is needed,
+    so we let the decoder deliver the grayscale image straight away.
+
+    Parameters
+    ----------
+    path: string
+        The path to the image file.
+    grayscale: boolean
+        Whether to read the image as grayscale; otherwise it is read in color.
+
+    Returns
+    -------
+    np array
+    """
+
+    return cv2.imread(path, cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR)
+
+
+def fileStamp(path):
+    """The size and modification time of a file.
+
+    Parameters
+    ----------
+    path: string
+        The path of the file.
+
+    Returns
+    -------
+    list | None
+        The size in bytes and the modification time in nanoseconds,
+        or None if the file does not exist.
+    """
+
+    if not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def writeColumns(path, data, dataTypes, source=None):
+    """Writes OCR data in columnar, binary form.
+
+    The rows of the data are stored as a two-dimensional integer array
+    in a `.npy` file, one column per field.
+    String fields are interned: the array holds the index of the string in
+    a table of distinct strings, which is stored in an accompanying `.json`
+    file.
+
+    The `.npy` file can be memory-mapped, so the numeric columns of many pages
+    can be inspected without parsing text.
+
+    Parameters
+    ----------
+    path: string
+        The path of the files without extension.
+    data: list of tuple
+        The rows of the data.
+    dataTypes: tuple of string
+        The type of each field, `int` or `str`.
+    source: string, optional `None`
+        The path of the TSV file with the same data.
+        Its size and modification time are stored in the `.json` file,
+        see `fileStamp`, so that a reader can tell whether the TSV file
+        has changed since.
+    """
+
+    strings = {}
+    strCols = [i for (i, tp) in enumerate(dataTypes) if tp == "str"]
+    rows = [list(fields) for fields in data]
+
+    for row in rows:
+        for i in strCols:
+            row[i] = strings.setdefault(row[i], len(strings))
+
+    columns = np.array(rows, dtype=np.int32).reshape(len(rows), len(dataTypes))
+
+    meta = dict(
+        types=dataTypes,
+        strings=list(strings),
+        source=None if source is None else fileStamp(source),
+    )
+    with open(f"{path}.json", "w") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    np.save(f"{path}.npy", columns)
+
+
+def readColumns(path, mmap=True):
+    """Reads OCR data that has been written by `writeColumns`.
+
+    Parameters
+    ----------
+    path: string
+        The path of the files without extension.
+    mmap: boolean, optional `True`
+        Whether to memory-map the array instead of reading it.
+
+    Returns
+    -------
+    tuple
+        The array with the columns, the types of the fields,
+        the table of strings, and the size and modification time of the
+        TSV file at the time of writing, see `fileStamp`.
+    """
+
+    columns = np.load(f"{path}.npy", mmap_mode="r" if mmap else None)
+    with open(f"{path}.json") as f:
+        meta = json.load(f)
+    return (columns, tuple(meta["types"]), meta["strings"], meta.get("source", None))
+
+
+def columnRows(columns, dataTypes, strings):
+    """Turns OCR data in columnar form back into rows.
+
+    Parameters
+    ----------
+    columns: np array
+        As delivered by `readColumns`.
+    dataTypes: tuple of string
+        The type of each field, `int` or `str`.
+    strings: list of string
+        The table of strings.
+
+    Returns
+    -------
+    list of tuple
+        The rows, exactly as they are read from the TSV file.
+    """
+
+    strCols = [i for (i, tp) in enumerate(dataTypes) if tp == "str"]
+    rows = columns.tolist()
+
+    for row in rows:
+        for i in strCols:
+            row[i] = strings[row[i]]
+
+    return [tuple(row) for row in rows]
+
+
 class Page:
     def __init__(
-        self, engine, f, minimal=False, sizeW=1, sizeH=1, batch=False, boxed=True
+        self,
+        engine,
+        f,
+        minimal=False,
+        sizeW=1,
+        sizeH=1,
+        batch=False,
+        boxed=True,
+        image=None,
     ):
         """All processing steps for a single page.
 
@@ -105,6 +256,10 @@ class Page:
         boxed: boolean, optional `True`
             If in batch mode, produce also images that display the cleaned marks
             in boxes.
+        image: np array, optional `None`
+            The scan, if it has been read already, see `readScan`.
+            It must be grayscale in batch mode without boxed output,
+            and colored otherwise.
         """
 
         self.engine = engine
@@ -117,6 +272,7 @@ class Page:
         self.batch = batch
         self.boxed = boxed
         self.stages = {}
+        self.stepsDone = set()
         self.blocks = {}
         self.dataHeaders = dict(char=HEADERS[0:-1], word=HEADERS, line=HEADERS[0:-3])
         self.dataTypes = dict(
@@ -126,19 +282,21 @@ class Page:
         if minimal:
             self.stages = {}
         else:
-            inDir = C.inDir
-            path = f"{inDir}/{f}"
-            if not batch and not os.path.exists(path):
-                error(f"Page file not found: {path}")
-                return
-
-            orig = cv2.imread(path)
-            (maxH, maxW) = orig.shape[0:2]
+            grayscale = batch and not boxed
+            if image is None:
+                inDir = C.inDir
+                path = f"{inDir}/{f}"
+                if not batch and not os.path.exists(path):
+                    error(f"Page file not found: {path}")
+                    return
+                image = readScan(path, grayscale)
+
+            self.stages = {"gray": image} if grayscale else {"orig": image}
+
+            (maxH, maxW) = image.shape[0:2]
             self.pageH = maxH if not sizeH or sizeH == 1 else int(round(maxH / sizeH))
             self.pageW = maxW if not sizeW or sizeW == 1 else int(round(maxW / sizeW))
 
-            self.stages = {"orig": orig}
-
     def show(self, stage=None, band=None, mark=None, **displayParams):
         """Displays processing stages of an page.
 
@@ -192,7 +350,16 @@ class Page:
         for s in parseStages(stage, set(stages), C.stageOrder, error):
             stageData = stages[s]
 
-            (stageType, stageColor, stageExt, stageDir, stagePart) = C.stages[s]
+            (
+                stageType,
+                stageColor,
+                stageExt,
+                stageDir,
+                stagePart,
+                consumers,
+            ) = C.stages[s]
+            if stageType == "cache":
+                continue
             white = C.whiteRGB if stageColor else C.whiteGRS
             if stageType == "data":
                 display(HTML(f"<hr>\n<div><b>{s}</b>: <i>data:</i></div>"))
@@ -226,9 +393,10 @@ class Page:
                 if band is not None or mark is not None:
                     img = (
                         stages["demarginedC"]
-                        if s == "boxed" and mark is not None
+                        if s == "boxed" and mark is not None and "demarginedC" in stages
                         else stageData
                     ).copy()
+                    regions = []
                     for ((stripe, block), data) in blocks.items():
 
                         bands = data["bands"]
@@ -269,24 +437,14 @@ class Page:
                                     bColor,
                                     2,
                                 )
-                                overlay(
-                                    img,
-                                    leftB,
-                                    theUpper,
-                                    theLeft,
-                                    theLower,
-                                    white,
-                                    bColor,
+                                regions.append(
+                                    (leftB, theUpper, theLeft, theLower, bColor)
                                 )
-                                overlay(
-                                    img,
-                                    theRight,
-                                    theUpper,
-                                    leftB + imBW,
-                                    theLower,
-                                    white,
-                                    bColor,
+                                regions.append(
+                                    (theRight, theUpper, leftB + imBW, theLower, bColor)
                                 )
+                    overlayMany(img, regions, white)
+
                     markData = stages.get("markData", {})
                     markLegend = {}
 
@@ -350,7 +508,14 @@ class Page:
         bare = self.bare
         ext = self.ext
 
-        (stageType, stageColor, stageExt, stageDir, stagePart) = C.stages[stage]
+        (
+            stageType,
+            stageColor,
+            stageExt,
+            stageDir,
+            stagePart,
+            consumers,
+        ) = C.stages[stage]
         dest = getattr(C, stageDir or "interDir")
         inter = "" if inter is None else f"-{inter}"
         trail = stage if stagePart is None else "" if not stagePart else stagePart
@@ -378,11 +543,19 @@ class Page:
         stages = self.stages
 
         for s in parseStages(stage, set(C.stages), C.stageOrder, error):
-            (stageType, stageColor, stageExt, stageDir, stagePart) = C.stages[s]
-
-            if stageType == "link":
+            (
+                stageType,
+                stageColor,
+                stageExt,
+                stageDir,
+                stagePart,
+                consumers,
+            ) = C.stages[s]
+
+            if stageType in {"link", "cache"}:
                 # stages of type link will be written to disk upon creation
-                # and not stored and need not be retrieved
+                # and not stored and need not be retrieved;
+                # stages of type cache are never stored
                 pass
             else:
                 sPath = self.stagePath(s)
@@ -394,8 +567,11 @@ class Page:
                 if stageType == "image":
                     stages[s] = cv2.imread(sPath)
                 elif stageType == "data":
-                    with open(sPath) as f:
-                        stages[s] = self._ingest(s, stageType, stageExt, f)
+                    data = self._ingestColumns(s, sPath)
+                    if data is None:
+                        with open(sPath) as f:
+                            data = self._ingest(s, stageType, stageExt, f)
+                    stages[s] = data
 
     def write(self, stage=None, perBlock=False):
         """Writes processing stages of an page to disk.
@@ -428,11 +604,35 @@ class Page:
         stages = self.stages
         blocks = self.blocks
 
+        # during a batch run, the book may have a writer that
+        # does the writing in the background
+
+        writer = engine.writer
+        put = (lambda func, *args: func(*args)) if writer is None else writer.submit
+
+        # and it may restrict the stages that end up on disk,
+        # see `fusus.parameters.OUTPUT_PROFILES`
+
+        outputs = engine.outputs
+
+        # the data stages go in one task, in stage order, so that a summary
+        # is never older than the data it is made of, see `Page.quality`
+
+        dataItems = []
+        columns = outputs is None or "columns" in outputs
+
         for s in parseStages(stage, set(C.stages), C.stageOrder, error):
-            if s not in stages:
+            if s not in stages or outputs is not None and s not in outputs:
                 continue
             stageData = stages[s]
-            (stageType, stageColor, stageExt, stageDir, stagePart) = C.stages[s]
+            (
+                stageType,
+                stageColor,
+                stageExt,
+                stageDir,
+                stagePart,
+                consumers,
+            ) = C.stages[s]
 
             if stageType == "image":
                 if perBlock:
@@ -441,17 +641,128 @@ class Page:
                         (leftB, topB, rightB, bottomB) = data["inner"]
                         roi = stageData[topB:bottomB, leftB:rightB]
                         thisPath = self.stagePath(stage, inter=blockSpec)
-                        writeImage(roi, thisPath)
+                        put(writeImage, roi, thisPath)
                 else:
-                    writeImage(stageData, self.stagePath(s))
+                    put(writeImage, stageData, self.stagePath(s))
             elif stageType == "data":
-                with open(self.stagePath(s), "w") as f:
-                    self._serial(s, stageData, stageExt, handle=f)
+                dataItems.append((s, stageData, stageExt, self.stagePath(s)))
             elif stageType == "link":
                 # stages of type link will be written to disk upon creation
                 # and not stored
                 pass
 
+        if dataItems:
+            put(self._writeDataItems, dataItems, columns)
+
+    def release(self, step, keep=()):
+        """Releases the image stages that are no longer needed.
+
+        Every stage declares the processing steps that consume it,
+        see `fusus.parameters.STAGES`.
+        When all consumers of a stage have run, the stage can go,
+        unless it still has to be written.
+
+        Parameters
+        ----------
+        step: string
+            The processing step that has just finished.
+        keep: iterable of string, optional `()`
+            The stages that must be kept, e.g. because they will be written.
+
+        Returns
+        -------
+        None
+            The stages are removed from the page.
+        """
+
+        C = self.engine.C
+        stagesInfo = C.stages
+        stepsDone = self.stepsDone
+        stepsDone.add(step)
+        stages = self.stages
+
+        for s in tuple(stages):
+            if s in keep or s not in stagesInfo:
+                continue
+            (
+                stageType,
+                stageColor,
+                stageExt,
+                stageDir,
+                stagePart,
+                consumers,
+            ) = stagesInfo[s]
+            if stageType == "image" and all(c in stepsDone for c in consumers):
+                del stages[s]
+
+    def columnsPath(self, stage):
+        """The path of the columnar form of the OCR data of a stage.
+
+        Next to the TSV files with the OCR data of a page, we write the same
+        data in binary form, see `writeColumns`.
+        These files go to the `inter` directory.
+
+        Parameters
+        ----------
+        stage: string
+            One of the stages with OCR data: `char`, `word`, `line`.
+
+        Returns
+        -------
+        string
+            The path without extension.
+        """
+
+        return f"{self.engine.C.interDir}/{self.bare}-{stage}"
+
+    def _writeDataItems(self, items, columns):
+        for (stage, data, extension, path) in items:
+            self._writeData(stage, data, extension, path, columns=columns)
+
+    def _writeData(self, stage, data, extension, path, columns=True):
+        dataTypes = self.dataTypes.get(stage, None) if columns else None
+        cPath = None if dataTypes is None else self.columnsPath(stage)
+
+        for thisPath in (path, cPath):
+            if thisPath is None:
+                continue
+            dirName = os.path.dirname(thisPath)
+            if dirName and not os.path.exists(dirName):
+                os.makedirs(dirName, exist_ok=True)
+
+        with open(path, "w") as f:
+            self._serial(stage, data, extension, handle=f)
+
+        if dataTypes is not None:
+            writeColumns(cPath, data, dataTypes, source=path)
+
+    def _ingestColumns(self, stage, path):
+        """Ingests OCR data from its columnar form, if possible.
+
+        The columnar form is only used if the TSV file at *path* has the same
+        size and modification time as when the columnar form was written,
+        and if it has the expected fields.
+
+        Returns
+        -------
+        list of tuple | None
+            The data, the same as what `Page._ingest` gets from the TSV file.
+            None if the columnar form cannot be used.
+        """
+
+        dataTypes = self.dataTypes.get(stage, None)
+        if dataTypes is None:
+            return None
+
+        cPath = self.columnsPath(stage)
+        if not all(os.path.exists(f"{cPath}.{ext}") for ext in ("npy", "json")):
+            return None
+
+        (columns, types, strings, source) = readColumns(cPath)
+        if types != dataTypes or source is None or source != fileStamp(path):
+            return None
+        return columnRows(columns, dataTypes, strings)
+
     def _serial(self, stage, data, extension, handle=None):
         """serializes data in accordance with file type.
 
@@ -590,9 +901,13 @@ class Page:
 
         Normalization produces the stages:
 
-        * *gray*: grayscale version of *orig*
+        * *gray*: grayscale version of *orig*;
+          in batch mode without boxed output the page is read as grayscale,
+          there is no *orig*, and the colour stages are not produced;
         * *blurred*: inverted, black-white, blurred without skew artefacts,
           needed for histograms later on;
+        * *integral*: the integral image of *blurred*, from which the
+          histograms are read off, see `fusus.lines.getIntegral`;
         * *normalized*: *gray* without skew artefacts;
         * *normalizedC*: *orig* without skew artefacts.
 
@@ -609,17 +924,24 @@ class Page:
         batch = self.batch
         boxed = self.boxed
         stages = self.stages
-        orig = stages["orig"]
-        gray = cv2.cvtColor(orig, cv2.COLOR_BGR2GRAY)
-        stages["gray"] = gray
+        orig = stages.get("orig", None)
+        if "gray" in stages:
+            gray = stages["gray"]
+        else:
+            gray = cv2.cvtColor(orig, cv2.COLOR_BGR2GRAY)
+            stages["gray"] = gray
         blurredGray = cv2.GaussianBlur(gray, (C.blurX, C.blurY), 0, 0)
-        (th, blurredGray) = cv2.threshold(
-            blurredGray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU
+        cv2.threshold(
+            blurredGray,
+            0,
+            255,
+            cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU,
+            dst=blurredGray,
         )
         crop = cropBorders(blurredGray)
 
         normalized = gray.copy()
-        removeBorders(normalized, crop, C.whiteGRS)
+        changed = removeBorders(normalized, crop, C.whiteGRS)
         stages["normalized"] = normalized
 
         if not batch or boxed:
@@ -627,18 +949,24 @@ class Page:
             removeBorders(normalizedC, crop, C.whiteRGB)
             stages["normalizedC"] = normalizedC
 
-        blurred = cv2.GaussianBlur(normalized, (C.blurX, C.blurY), 0, 0)
-
-        (th, blurred) = cv2.threshold(
-            blurred, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU
-        )
+        if changed:
+            # we blur again, reusing the buffer of the first blur
+            blurred = cv2.GaussianBlur(
+                normalized, (C.blurX, C.blurY), 0, dst=blurredGray
+            )
+            cv2.threshold(
+                blurred, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU, dst=blurred
+            )
+        else:
+            # normalized is identical to gray,
+            # so blurring it again would give the same result
+            blurred = blurredGray
 
         stages["blurred"] = blurred
 
         # detect if the image is empty
 
-        pts = cv2.findNonZero(blurred)
-        if pts is None:
+        if not cv2.countNonZero(blurred):
             self.empty = True
             if not batch:
                 info("empty page")
@@ -646,6 +974,11 @@ class Page:
 
         self.empty = False
 
+        # the integral image of the blurred stage serves all histograms
+        # of the layout step
+
+        stages["integral"] = getIntegral(blurred)
+
     def doLayout(self):
         """Divide the page into stripes and the stripes into blocks.
 
@@ -691,23 +1024,46 @@ class Page:
         indent = tm.indent
         info = tm.info
 
+        profiler = engine.profiler
+        span = profiler.span
+
         pageW = self.pageW
         pageH = self.pageH
 
+        # during a batch run, the book may have a line height prior,
+        # see `fusus.lines.linePrior`
+
+        prior = engine.linePrior
+
         stages = self.stages
-        if not batch or boxed:
+        if not batch:
             stages["layout"] = stages["normalizedC"].copy()
 
         indent(level=3)
-        stretchesH = getStretches(C, info, stages, pageW, True, batch)
-        stretchesV = getStretches(C, info, stages, pageH, False, batch)
+        with span("getStretches"):
+            stretchesH = getStretches(C, info, stages, pageW, True, batch)
+            stretchesV = getStretches(C, info, stages, pageH, False, batch)
         stripes = getStripes(stages, stretchesV)
-        blocks = getBlocks(C, info, stages, pageH, stripes, stretchesH, batch)
+        with span("getBlocks"):
+            blocks = getBlocks(
+                C, info, stages, pageH, stripes, stretchesH, batch, prior=prior
+            )
         if debug:
             showImage(stages["layout"])
         self.blocks = blocks
         applyHRules(C, stages, stretchesH, stripes, blocks, batch, boxed)
-        emptyBlocks = getInkDistribution(C, info, stages, pageH, blocks, batch, boxed)
+        with span("getInkDistribution"):
+            emptyBlocks = getInkDistribution(
+                C, info, stages, pageH, blocks, batch, boxed, prior=prior
+            )
+            profiler.count(
+                blocks=len(blocks) - len(emptyBlocks),
+                lines=sum(
+                    len(data["bands"]["main"]["lines"])
+                    for (b, data) in blocks.items()
+                    if b not in emptyBlocks and "bands" in data
+                ),
+            )
 
         if not batch:
             grayInterBlocks(C, stages, blocks)
@@ -715,6 +1071,11 @@ class Page:
         for b in emptyBlocks:
             del blocks[b]
 
+        # the integral image has served its purpose,
+        # also outside batch mode, since it is never shown
+
+        stages.pop("integral", None)
+
     def cleaning(self, mark=None, block=None, line=None, showKept=False):
         """Remove marks from the page.
 
@@ -727,6 +1088,10 @@ class Page:
         *   *boxed* all targeted marks boxed in light gray
         *   *markData* information about each detected mark.
 
+        In batch mode *clean* and *boxed* take over the images of
+        *demargined* and *demarginedC*, which are then no longer available
+        as stages.
+
         Parameters
         ----------
         mark: iterable of tuples (band, mark, [params]), optional `None`
@@ -758,6 +1123,9 @@ class Page:
         error = tm.error
         warning = tm.warning
         C = engine.C
+        profiler = engine.profiler
+        spanLoop = profiler.spanLoop
+        count = profiler.count
 
         marks = engine.marks
         batch = self.batch
@@ -798,16 +1166,48 @@ class Page:
                     )
 
         stages = self.stages
-        demargined = stages.get("demargined", stages["gray"])
+        demargined = stages.get("demargined", None)
+        if demargined is None:
+            demargined = stages["gray"]
         if batch:
             resultStages = ("clean", "boxed") if boxed else ("clean",)
-            if boxed:
-                demarginedC = stages.get("demarginedC", stages["orig"])
         else:
-            demarginedC = stages.get("demarginedC", stages["orig"])
             resultStages = ("clean", "cleanh", "boxed")
-        for stage in resultStages:
-            stages[stage] = (demarginedC if stage == "boxed" else demargined).copy()
+        if "boxed" in resultStages:
+            demarginedC = stages.get("demarginedC", None)
+            if demarginedC is None:
+                demarginedC = stages["orig"]
+
+        # In batch mode the demargined stages have no consumers after cleaning,
+        # so the result stages take over their pixels instead of copying them.
+        # The mark search must still see the pixels before wiping:
+        # those are copied per block, just before the first wipe in that block.
+        # Blocks that are not wiped are never copied.
+        # This only works if a wipe in one block cannot reach into the
+        # search area of another block.
+
+        shared = (
+            batch
+            and "demargined" in stages
+            and (not boxed or "demarginedC" in stages)
+            and not overlapping(
+                [
+                    (left, top, right + 1, bottom + 1)
+                    for (b, data) in self.blocks.items()
+                    for (left, top, right, bottom) in (data["inner"],)
+                    if block is None or b == block
+                ]
+            )
+        )
+        if shared:
+            del stages["demargined"]
+            stages["clean"] = demargined
+            if boxed:
+                del stages["demarginedC"]
+                stages["boxed"] = demarginedC
+        else:
+            for stage in resultStages:
+                stages[stage] = (demarginedC if stage == "boxed" else demargined).copy()
 
         tasks = [
             (
@@ -824,11 +1224,12 @@ class Page:
         blocks = self.blocks
         markResults = {}
 
-        for ((stripe, block), data) in blocks.items():
-            if block is not None and block != (stripe, block):
+        for ((stripe, theBlock), data) in blocks.items():
+            if block is not None and block != (stripe, theBlock):
                 continue
             (leftB, topB, rightB, bottomB) = data["inner"]
             thisDemargined = demargined[topB:bottomB, leftB:rightB]
+            private = not shared
             if not batch or boxed:
                 thisBoxed = stages["boxed"][topB:bottomB, leftB:rightB]
                 theUpper = None
@@ -837,12 +1238,14 @@ class Page:
 
             for (band, markData) in searchMarks.items():
                 if "bands" not in data:
-                    # error(f"No bands in {stripe}{block}")
+                    # error(f"No bands in {stripe}{theBlock}")
                     continue
                 bandData = data["bands"][band]
                 lines = bandData["lines"]
 
-                for (markName, markInfo) in markData.items():
+                for (markName, markInfo) in spanLoop(
+                    markData.items(), "match", detail=True, band=band
+                ):
                     foundHits.setdefault(band, {})[markName] = 0
                     seq = markInfo["seq"]
                     mark = markInfo["gray"]
@@ -871,6 +1274,7 @@ class Page:
                             # search template exceeds roi image
                             continue
                         result = cv2.matchTemplate(roi, mark, cv2.TM_CCOEFF_NORMED)
+                        count(searches=1)
                         loc = np.where(result >= accuracy)
                         pts = list(zip(*loc))
 
@@ -892,6 +1296,7 @@ class Page:
 
                         nPts += len(pts)
                         clusters = cluster(pts, result)
+                        count(hits=len(clusters))
 
                         # We pick the representant hit from each cluster and
                         # check the ink connectedness
@@ -909,6 +1314,7 @@ class Page:
                                 pt[0] + markH,
                             )
                             if connDegree > ratio:
+                                count(kept=1)
                                 if showKept and (not batch or boxed):
                                     im = stages["boxed"]
                                     addBox(
@@ -932,7 +1338,7 @@ class Page:
                                             connDegree,
                                             connectBorder,
                                             stripe,
-                                            block,
+                                            theBlock,
                                             left,
                                             top,
                                             right,
@@ -940,6 +1346,11 @@ class Page:
                                         )
                                     )
                             else:
+                                count(wiped=1)
+                                if not private:
+                                    thisDemargined = thisDemargined.copy()
+                                    roi = thisDemargined[up : lo + 1]
+                                    private = True
                                 if batch and not boxed:
                                     cv2.rectangle(
                                         stages["clean"],
@@ -973,7 +1384,7 @@ class Page:
                                                     connDegree,
                                                     connectBorder,
                                                     stripe,
-                                                    block,
+                                                    theBlock,
                                                     left,
                                                     top,
                                                     right,
@@ -995,7 +1406,7 @@ class Page:
                     thisTop = max(0, theUpper - grace)
                     thisBottom = min(maxH, theLower + grace)
                     info(
-                        f"block {stripe}{block} line {line} BEFORE/AFTER cleaning\n",
+                        f"block {stripe}{theBlock} line {line} BEFORE/AFTER cleaning\n",
                         tm=False,
                     )
                     roi = thisDemargined[thisTop:thisBottom]
@@ -1089,9 +1500,54 @@ class Page:
 
         engine = self.engine
         OCR = engine.OCR
+        span = engine.profiler.span
 
-        OCR.read(self)
-        OCR.proofing(self)
+        outputs = engine.outputs
+        proof = outputs is None or "proofchar" in outputs or "proofword" in outputs
+
+        # the proof pages and the database need all OCR data;
+        # otherwise only the data that will be written is made
+
+        with span("read"):
+            OCR.read(self, outputs=None if proof or engine.storing else outputs)
+        if proof:
+            with span("proofing"):
+                OCR.proofing(self)
+
+    def quality(self):
+        """The summary of the confidences of the OCR results of this page.
+
+        The summary is made when the page is OCR-ed, see
+        `fusus.ocr.qualitySummary`.
+        If it is missing, or older than the OCR results, it is made from
+        the OCR results on disk, and then written.
+
+        Returns
+        -------
+        dict | None
+            The summary, or None if the page has no OCR results.
+        """
+
+        stages = self.stages
+        path = self.stagePath("quality")
+        sources = [self.stagePath(s) for s in ("word", "char")]
+
+        if not all(os.path.exists(p) for p in sources):
+            self.empty = True
+            return None
+
+        if os.path.exists(path) and all(
+            os.path.getmtime(path) >= os.path.getmtime(p) for p in sources
+        ):
+            self.read(stage="quality")
+        else:
+            missing = [s for s in ("word", "char") if stages.get(s, None) is None]
+            if missing:
+                self.read(stage=missing)
+            stages["quality"] = qualitySummary(stages["char"], stages["word"])
+            self.write(stage="quality")
+
+        return stages["quality"]
 
     def proofing(self):
         """Produces proofing images"""
@@ -107,25 +107,27 @@ Each band will be displayed in its own color.
 """
 
 STAGES = dict(
-    orig=("image", True, None, None, None),
-    gray=("image", False, None, None, None),
-    blurred=("image", False, None, None, None),
-    normalized=("image", False, None, "proofDir", ""),
-    normalizedC=("image", True, None, None, None),
-    layout=("image", True, None, None, None),
-    histogram=("image", True, None, None, None),
-    demargined=("image", False, None, None, None),
-    demarginedC=("image", True, None, None, None),
-    markData=("data", None, "tsv", None, None),
-    boxed=("image", True, None, None, None),
-    cleanh=("image", False, None, None, None),
-    clean=("image", False, None, "cleanDir", ""),
-    binary=("image", False, None, None, None),
-    char=("data", None, "tsv", "proofDir", None),
-    word=("data", None, "tsv", "outDir", ""),
-    line=("data", None, "tsv", "proofDir", "line"),
-    proofchar=("link", True, "html", "proofDir", "char"),
-    proofword=("link", True, "html", "proofDir", ""),
+    orig=("image", True, None, None, None, ("doNormalize",)),
+    gray=("image", False, None, None, None, ("doNormalize",)),
+    blurred=("image", False, None, None, None, ("doLayout",)),
+    integral=("cache", None, None, None, None, ("doLayout",)),
+    normalized=("image", False, None, "proofDir", "", ("doLayout", "ocring")),
+    normalizedC=("image", True, None, None, None, ("doLayout",)),
+    layout=("image", True, None, None, None, ("doLayout",)),
+    histogram=("image", True, None, None, None, ()),
+    demargined=("image", False, None, None, None, ("cleaning",)),
+    demarginedC=("image", True, None, None, None, ("cleaning",)),
+    markData=("data", None, "tsv", None, None, ()),
+    boxed=("image", True, None, None, None, ()),
+    cleanh=("image", False, None, None, None, ()),
+    clean=("image", False, None, "cleanDir", "", ("ocring",)),
+    binary=("image", False, None, None, None, ()),
+    char=("data", None, "tsv", "proofDir", None, ()),
+    word=("data", None, "tsv", "outDir", "", ()),
+    line=("data", None, "tsv", "proofDir", "line", ()),
+    quality=("data", None, "json", None, None, ()),
+    proofchar=("link", True, "html", "proofDir", "char", ()),
+    proofword=("link", True, "html", "proofDir", "", ()),
 )
 """Stages in page processing.
 
@@ -135,9 +137,63 @@ in this order.
 
 The stage data consists of the following bits of information:
 
-* kind: image or data (i.e. tab separated files with unicode data).
+* kind: image or data (i.e. tab separated files with unicode data),
+  link (a file that is written upon creation, such as a proof page),
+  or cache (derived data that is only kept in memory for its consumers;
+  it is never shown, read or written, and it is dropped after its consumers
+  have run).
 * colored: True if colored, False if grayscale, None if not an image
 * extension: None if an image file, otherwise the extension of a data file, e.g. `tsv`
+* directory: the setting that holds the directory where the stage is written;
+  if None, it is the `interDir`
+* part: the suffix of the file name of the written stage;
+  if None, it is the name of the stage
+* consumers: the processing steps of `fusus.book.Book` that read the stage
+  after it has been produced.
+  In a batch run an image stage is released as soon as all its consumers
+  have run, unless it still has to be written,
+  see `fusus.page.Page.release`.
+"""
+
+OUTPUT_PROFILES = dict(
+    minimal=("word",),
+    proof=(
+        "normalized",
+        "char",
+        "word",
+        "line",
+        "quality",
+        "proofchar",
+        "proofword",
+        "columns",
+    ),
+    full=tuple(STAGES) + ("columns",),
+)
+"""Which stages are written in a batch run.
+
+A batch run, `fusus.book.Book.process`, can be performed with one of these
+output profiles; the default is given by the setting `outputProfile`.
+
+Besides stages, a profile may name `columns`: the OCR data that is written
+also goes to the `inter` directory in columnar, binary form,
+see `fusus.page.writeColumns`.
+
+minimal
+:   only the OCR results at word level: the files in `out`.
+    No images are written, no proof pages are made,
+    and there is no columnar form of the OCR data.
+
+proof
+:   everything that is needed to proofread the OCR results:
+    the TSV files at character, word and line level and their columnar form,
+    the summary of the OCR confidences of each page,
+    the normalized page images and the proof pages.
+    This is also what `fusus.book.Book.measureQuality` needs.
+
+full
+:   all stages that the run produces, including the cleaned images,
+    the histograms (outside batch mode), the mark data and the boxed images,
+    and the columnar form of the OCR data.
 """
 
 SETTINGS = dict(
@@ -149,6 +205,16 @@ SETTINGS = dict(
     proofDir="proof",
     htmlDir="html",
     marksDir="marks",
+    blankCheck=False,
+    blankReduce=4,
+    blankMargin=0.1,
+    blankContrast=64,
+    blankInk=0.001,
+    outputProfile="full",
+    prefetch=2,
+    writeWorkers=2,
+    writeQueue=8,
+    database=False,
     blurX=21,
     blurY=21,
     marginThresholdX=1,
@@ -173,6 +239,9 @@ SETTINGS = dict(
     bandHigh=(10, 30),
     bandLow=(-10, -10),
     defaultLineHeight=200,
+    linePrior=False,
+    linePriorPages=5,
+    linePriorSpread=0.1,
 )
 """Customizable settings.
 
@@ -217,6 +286,59 @@ cleanDir
 marksDir
 :   name of the subdirectory with the marks
 
+blankCheck
+:   whether to check pages for blankness before processing them.
+
+    The check is done on a version of the scan that is decoded at a reduced size,
+    see `fusus.lib.isBlank`.
+    Blank pages are skipped by `fusus.book.Book.process` and recorded as such
+    in the manifest of the book.
+    Their data files are written empty, so that every page has them.
+
+    Off by default: a page with only a few faint marks may be taken for blank.
+
+blankReduce
+:   the factor by which the scan is reduced for the blankness check:
+    1, 2, 4 or 8.
+
+blankMargin
+:   the fraction of the width and height of the page on each side
+    that is ignored in the blankness check, so that scanning borders do not count.
+
+blankContrast
+:   how much darker than the paper a pixel must be in order to count as ink
+    in the blankness check.
+
+blankInk
+:   the fraction of ink pixels below which a page counts as blank.
+
+    On real text pages we have seen more than 1% ink; a page with only a
+    page number on it has less than 0.1%.
+
+outputProfile
+:   the output profile of a batch run, one of the keys of `OUTPUT_PROFILES`.
+    It determines which stages are written to disk, and whether proof pages
+    are made at all.
+
+prefetch
+:   the number of pages ahead whose scans are read and decoded in background
+    threads during `fusus.book.Book.process`, including the blankness check.
+    If `0`, each scan is read when its page is processed.
+
+writeWorkers
+:   the number of background threads that write output files
+    during `fusus.book.Book.process`.
+    If `0`, files are written by the processing thread itself.
+
+writeQueue
+:   the maximum number of files that are waiting to be written
+    by the background threads.
+    When this number is reached, processing waits until a file has been written.
+
+database
+:   whether `fusus.book.Book.process` maintains a database with the OCR results
+    of all pages, in the `inter` directory, see `fusus.store`.
+
 skewBorder
 :   the  width of the page  margins that will be whitened in order to
     suppress the sharp black triangles introduces by skewing the page
@@ -296,11 +418,32 @@ outerValleyShiftFraction
 defaultLineHeight
 :   used for line detection
 
-    After line detection, a value for the line height is found and stored in this
-    parameter. The parameter is read when there is only one line on a page, in
-    which case the line detection algorithm has too little information.
-    If this occurs at the very first calculation of line heights, a fixed
-    default value is used.
+    The parameter is read when there is only one line in a block, in
+    which case the line detection algorithm has too little information,
+    and there is no line height prior (see `linePrior`).
+
+linePrior
+:   whether batch runs use the line heights of the pages of earlier runs
+    as a prior for line detection, see `fusus.lines.linePrior`.
+
+    The line heights per page are kept in the manifest of the book,
+    see `fusus.book.Book.manifest`.
+    The prior is fixed at the start of a run, so that the results of a run
+    do not depend on the order of the pages.
+    Only the line heights found in runs without a prior are recorded,
+    so that the prior does not feed on its own results.
+    Note that a run with a prior may give slightly different lines
+    than a run without it.
+
+    Off by default.
+
+linePriorPages
+:   the minimum number of pages with a line height before the prior is used.
+
+linePriorSpread
+:   the maximum spread of the line heights of the pages before the prior is used:
+    the median of the absolute deviations from the median line height,
+    as a fraction of the median line height.
 
 accuracy
 :   When marks are searched for in the page, we get the result in the form
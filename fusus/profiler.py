@@ -0,0 +1,383 @@
+"""Instrumentation of the pipeline.
+
+When a book is processed with profiling switched on
+(see `fusus.book.Book.process`), the processing steps of each page
+are measured:
+
+*   wall time;
+*   CPU time of the thread that performs the step;
+*   peak resident memory of the process after the step;
+*   counters, such as the number of mark searches, hits, lines and
+    recognised characters.
+
+Every measurement is a *span*: the execution of a named step.
+Spans are nested: the layout step of a page contains sub-spans for
+the detection of strokes, blocks and lines.
+
+The spans of a run are written, one JSON object per line,
+to a file `profile-`*timestamp*`.jsonl` in the `inter` directory of the book.
+The fields of a record are:
+
+field | meaning
+--- | ---
+`page` | the page (file name without extension) that was being processed
+`stage` | the name of the step, prefixed by the names of its enclosing steps
+`start` | start of the step in seconds since the start of the run
+`wall` | wall time in seconds
+`cpu` | CPU time of the thread in seconds
+`rss` | peak resident memory of the process in bytes (`null` if unknown)
+`tid` | identifier of the thread that performed the step
+`counters` | the counts collected during the step
+
+`fusus.book.Book.profileReport` shows a summary table per step.
+
+The spans of a run can also be written as a *trace*: a JSON file in the
+[trace event format](https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU)
+that can be opened in `chrome://tracing`, [Perfetto](https://ui.perfetto.dev) or
+[speedscope](https://www.speedscope.app).
+It shows the nesting of the steps per page on a time line, per thread.
+A trace contains more detail than the profile: it also has the mark matching
+per band in the cleaning step and the recognition of each line by Kraken.
+
+When profiling and tracing are off, spans and counters cost next to nothing.
+"""
+
+import sys
+import os
+import json
+import time
+import threading
+from contextlib import nullcontext
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+PROFILE_PREFIX = "profile-"
+PROFILE_EXT = "jsonl"
+
+
+def peakRss():
+    """Peak resident memory of the current process.
+
+    Returns
+    -------
+    int | None
+        The number of bytes, or `None` if the platform does not tell.
+    """
+
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class Span:
+    def __init__(self, profiler, name, page, detail, args):
+        """A step that is being measured.
+
+        Use it as a context manager, see `Profiler.span`.
+        """
+
+        self.profiler = profiler
+        self.name = name
+        self.page = page
+        self.detail = detail
+        self.args = args
+        self.counters = {}
+
+    def __enter__(self):
+        profiler = self.profiler
+        stack = profiler._stack()
+        parent = stack[-1] if stack else None
+
+        if self.page is None:
+            self.page = None if parent is None else parent.page
+            self.path = (
+                self.name
+                if parent is None or not parent.path
+                else f"{parent.path}/{self.name}"
+            )
+        else:
+            # a page span is the root of the steps on that page
+            self.path = ""
+
+        stack.append(self)
+        self.startCpu = time.thread_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        endCpu = time.thread_time()
+        profiler = self.profiler
+        profiler._stack().pop()
+        profiler._record(
+            dict(
+                page=self.page,
+                stage=self.path or self.name,
+                start=round(self.start - profiler.origin, 6),
+                wall=round(end - self.start, 6),
+                cpu=round(endCpu - self.startCpu, 6),
+                rss=peakRss(),
+                tid=threading.get_ident(),
+                counters=self.counters,
+            ),
+            self,
+        )
+        return False
+
+
+class Profiler:
+    def __init__(self):
+        """Collects timing, memory and counter information of a run.
+
+        A profiler is inactive until `Profiler.start` is called.
+        """
+
+        self.active = False
+        self.tracing = False
+        self.path = None
+        self.tracePath = None
+        self.origin = time.perf_counter()
+        self.handle = None
+        self.events = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def start(self, path=None, trace=None):
+        """Starts profiling a run.
+
+        Parameters
+        ----------
+        path: string, optional `None`
+            The file to which the spans of this run are written.
+        trace: string, optional `None`
+            The file to which the trace of this run is written, when the run
+            stops.
+        """
+
+        self.stop()
+        for f in (path, trace):
+            if f is None:
+                continue
+            dirName = os.path.dirname(f)
+            if dirName and not os.path.exists(dirName):
+                os.makedirs(dirName, exist_ok=True)
+        self.path = path
+        if path is not None:
+            self.handle = open(path, "w")
+        self.tracePath = trace
+        self.tracing = trace is not None
+        self.events = []
+        self.origin = time.perf_counter()
+        self.active = path is not None or self.tracing
+
+    def stop(self):
+        """Stops profiling, closes the profile file and writes the trace."""
+
+        self.active = False
+        with self.lock:
+            if self.handle is not None:
+                self.handle.close()
+                self.handle = None
+            if self.tracing:
+                self.tracing = False
+                self._writeTrace()
+
+    def span(self, name, page=None, detail=False, **args):
+        """Measures a step.
+
+        Parameters
+        ----------
+        name: string
+            The name of the step
+        page: string, optional `None`
+            If given, the span is the root span of the processing of this page.
+            Otherwise the span belongs to the page of the enclosing span.
+        detail: boolean, optional `False`
+            Whether the span is a fine grained step.
+            Such spans only end up in the trace, not in the profile,
+            and they are not measured if there is no trace.
+        args: dict, optional
+            Additional information that is shown with the span in the trace.
+
+        Returns
+        -------
+        context manager
+            Use it in a `with` statement around the step.
+        """
+
+        return (
+            Span(self, name, page, detail, args)
+            if self.tracing or (self.active and not detail)
+            else nullcontext()
+        )
+
+    def spanLoop(self, items, name, page=None, detail=False, **args):
+        """Measures a loop as a single step.
+
+        Use it instead of a `with` statement around a loop: the loop keeps its
+        indentation, and its body runs inside the span.
+        The span ends when the items are exhausted.
+
+        Parameters
+        ----------
+        items: iterable
+            The items of the loop.
+        name, page, detail, args:
+            As in `Profiler.span`.
+
+        Returns
+        -------
+        generator
+            The items.
+        """
+
+        with self.span(name, page=page, detail=detail, **args):
+            yield from items
+
+    def count(self, **counters):
+        """Adds counts to the innermost step that is being measured.
+
+        If that is a detail step, the counts are also added to the enclosing
+        steps up to the innermost step that is not a detail step.
+
+        Parameters
+        ----------
+        counters: dict
+            Keyed by the name of the counter, valued by the amount to add.
+        """
+
+        if not self.active:
+            return
+
+        stack = self._stack()
+        if not stack:
+            return
+
+        for span in reversed(stack):
+            dest = span.counters
+            for (k, n) in counters.items():
+                dest[k] = dest.get(k, 0) + n
+            if not span.detail:
+                break
+
+    def _stack(self):
+        local = self.local
+        stack = getattr(local, "stack", None)
+        if stack is None:
+            stack = []
+            local.stack = stack
+        return stack
+
+    def _record(self, record, span):
+        line = None if span.detail else json.dumps(record) + "\n"
+        with self.lock:
+            if line is not None and self.handle is not None:
+                self.handle.write(line)
+            if self.tracing:
+                page = record["page"]
+                name = span.name if span.path else f"{span.name} {page}"
+                args = dict(span.args)
+                if page is not None:
+                    args["page"] = page
+                args.update(record["counters"])
+                self.events.append(
+                    dict(
+                        name=name,
+                        cat=record["stage"],
+                        ph="X",
+                        ts=round((span.start - self.origin) * 1000000, 1),
+                        dur=round(record["wall"] * 1000000, 1),
+                        pid=os.getpid(),
+                        tid=record["tid"],
+                        args=args,
+                    )
+                )
+
+    def _writeTrace(self):
+        pid = os.getpid()
+        events = self.events
+        threads = sorted({event["tid"] for event in events})
+        mainThread = threading.main_thread().ident
+
+        metaEvents = [
+            dict(name="process_name", ph="M", pid=pid, args=dict(name="fusus"))
+        ]
+        for (i, tid) in enumerate(threads):
+            name = "main" if tid == mainThread else f"worker {i}"
+            metaEvents.append(
+                dict(name="thread_name", ph="M", pid=pid, tid=tid, args=dict(name=name))
+            )
+
+        with open(self.tracePath, "w") as fh:
+            json.dump(
+                dict(traceEvents=metaEvents + events, displayTimeUnit="ms"),
+                fh,
+                separators=(",", ":"),
+            )
+        self.events = []
+
+
+def readProfile(path):
+    """Reads the spans of a profile file.
+
+    Parameters
+    ----------
+    path: string
+        A file written by a `Profiler`.
+
+    Returns
+    -------
+    list of dict
+        The span records in the order in which the spans have ended.
+    """
+
+    with open(path) as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+def summarize(records):
+    """Aggregates span records per step.
+
+    Parameters
+    ----------
+    records: iterable of dict
+        As delivered by `readProfile`.
+
+    Returns
+    -------
+    list of tuple
+        Per step: name, number of spans, total wall time, total cpu time,
+        maximum peak memory (or `None`) and the summed counters.
+        The steps are in the order in which they have first started.
+    """
+
+    summary = {}
+    firstStart = {}
+
+    for record in records:
+        stage = record["stage"]
+        start = record["start"]
+        if stage not in summary:
+            summary[stage] = [0, 0.0, 0.0, None, {}]
+            firstStart[stage] = start
+        elif start < firstStart[stage]:
+            firstStart[stage] = start
+        dest = summary[stage]
+        dest[0] += 1
+        dest[1] += record["wall"]
+        dest[2] += record["cpu"]
+        rss = record["rss"]
+        if rss is not None and (dest[3] is None or rss > dest[3]):
+            dest[3] = rss
+        counters = dest[4]
+        for (k, n) in record["counters"].items():
+            counters[k] = counters.get(k, 0) + n
+
+    return [
+        (stage, *summary[stage]) for stage in sorted(summary, key=firstStart.get)
+    ]
@@ -0,0 +1,287 @@
+"""A database of the OCR results of a book.
+
+The OCR results of a page are written to tab separated files, per page,
+see `fusus.book`.
+When the setting `database` is on, `fusus.book.Book.process` also maintains
+a [SQLite](https://sqlite.org) database with the OCR results of all pages:
+the file `ocr.sqlite` in the `inter` directory of the book.
+
+It has a table per level of OCR data, with the same fields as the TSV files,
+plus the page number:
+
+table | fields
+--- | ---
+`char` | `page stripe block line left top right bottom confidence letters`
+`word` | `page stripe block line left top right bottom confidence letters punc`
+`line` | `page stripe block line left top right bottom`
+
+The rows of a page are in the same order as in its TSV file.
+The tables are indexed by page and line, and the `char` and `word` tables
+also by confidence and by letters.
+
+When a page is processed again, its rows are replaced.
+When a page turns out to be blank or empty, its rows are removed.
+
+Use `fusus.book.Book.store` to open the database of a book, and then, e.g.
+
+``` python
+S = B.store()
+S.lowConfidence(40)
+S.text(pages="200-250")
+S.select("select letters, avg(confidence) from char group by letters")
+```
+"""
+
+import os
+import sqlite3
+
+from tf.core.helpers import rangesFromList
+
+from .lib import parseNums
+from .page import HEADERS, DATA_TYPES
+
+
+STORE_FILE = "ocr.sqlite"
+
+LEVELS = dict(
+    char=(HEADERS[0:-1], DATA_TYPES[0:-1]),
+    word=(HEADERS, DATA_TYPES),
+    line=(HEADERS[0:-3], DATA_TYPES[0:-3]),
+)
+"""The fields and their types per level of OCR data.
+
+The first field, `page`, is not in the data of a page but is added
+when it goes into the database.
+"""
+
+INDEXES = dict(
+    char=(("page", "stripe", "block", "line"), ("confidence",), ("letters",)),
+    word=(("page", "stripe", "block", "line"), ("confidence",), ("letters",)),
+    line=(("page", "stripe", "block", "line"),),
+)
+"""The indexes per table."""
+
+
+def quote(name):
+    return f'"{name}"'
+
+
+def pagesCondition(pages):
+    """Makes an SQL condition that selects pages.
+
+    Parameters
+    ----------
+    pages: string | int | iterable of int | None
+        The pages, see `fusus.lib.parseNums`.
+
+    Returns
+    -------
+    tuple
+        The condition and its parameters.
+        If all pages are selected, the condition is `1`.
+    """
+
+    nums = parseNums(pages)
+    if nums is None:
+        return ("1", ())
+
+    conditions = []
+    params = []
+    for (b, e) in rangesFromList(sorted(nums)):
+        conditions.append("page between ? and ?")
+        params.extend((b, e))
+    return (f"({' or '.join(conditions)})" if conditions else "0", tuple(params))
+
+
+class Store:
+    def __init__(self, path):
+        """Opens the OCR database of a book, and creates it if needed.
+
+        Parameters
+        ----------
+        path: string
+            The path to the database file.
+        """
+
+        dirName = os.path.dirname(path)
+        if dirName and not os.path.exists(dirName):
+            os.makedirs(dirName, exist_ok=True)
+
+        self.path = path
+        self.db = sqlite3.connect(path)
+
+        with self.db as db:
+            for (level, (fields, dataTypes)) in LEVELS.items():
+                columns = ", ".join(
+                    f"{quote(field)} {'integer' if tp == 'int' else 'text'}"
+                    for (field, tp) in zip(fields, ("int", *dataTypes))
+                )
+                db.execute(f"create table if not exists {level} ({columns})")
+                for indexFields in INDEXES[level]:
+                    name = f"{level}_{'_'.join(indexFields)}"
+                    db.execute(
+                        f"create index if not exists {name}"
+                        f" on {level} ({', '.join(quote(f) for f in indexFields)})"
+                    )
+
+    def close(self):
+        """Closes the database."""
+
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def putPage(self, page, data):
+        """Stores the OCR data of a page.
+
+        The data of the page that is already in the database is replaced.
+
+        Parameters
+        ----------
+        page: int
+            The page number.
+        data: dict
+            Keyed by level (`char`, `word`, `line`), valued by the rows of the
+            page, as in the stages of `fusus.page.Page`.
+            Levels that are missing are left empty for this page.
+        """
+
+        # the numbers in the stages may be numpy integers,
+        # which sqlite3 would store as blobs
+
+        with self.db as db:
+            for (level, (fields, dataTypes)) in LEVELS.items():
+                db.execute(f"delete from {level} where page = ?", (page,))
+                rows = data.get(level, None)
+                if not rows:
+                    continue
+                casts = tuple(int if tp == "int" else str for tp in dataTypes)
+                db.executemany(
+                    f"insert into {level} values ({', '.join('?' for f in fields)})",
+                    (
+                        (page, *(cast(v) for (cast, v) in zip(casts, row)))
+                        for row in rows
+                    ),
+                )
+
+    def deletePage(self, page):
+        """Removes the OCR data of a page.
+
+        Parameters
+        ----------
+        page: int
+            The page number.
+        """
+
+        with self.db as db:
+            for level in LEVELS:
+                db.execute(f"delete from {level} where page = ?", (page,))
+
+    def select(self, sql, params=()):
+        """Runs a query on the database.
+
+        Parameters
+        ----------
+        sql: string
+            The query.
+        params: tuple, optional `()`
+            The values of the parameters of the query.
+
+        Returns
+        -------
+        list of tuple
+            The result rows.
+        """
+
+        return self.db.execute(sql, params).fetchall()
+
+    def pages(self):
+        """The pages that have OCR data in the database.
+
+        Returns
+        -------
+        list of int
+        """
+
+        rows = self.select("select distinct page from word order by page")
+        return [r[0] for r in rows]
+
+    def lowConfidence(self, threshold, level="char", pages=None):
+        """Finds the OCR results with a low confidence.
+
+        Parameters
+        ----------
+        threshold: int
+            Results with a confidence below this value are returned.
+        level: string, optional `char`
+            `char` or `word`.
+        pages: string | int | iterable of int, optional `None`
+            If given, only look in these pages, see `fusus.lib.parseNums`.
+
+        Returns
+        -------
+        list of tuple
+            The rows, with the fields as in the table, ordered by confidence,
+            and then by position in the book.
+        """
+
+        (condition, params) = pagesCondition(pages)
+        return self.select(
+            f"select * from {level} where confidence < ? and {condition}"
+            " order by confidence, page, rowid",
+            (threshold, *params),
+        )
+
+    def text(self, pages=None):
+        """The recognized text of pages.
+
+        Parameters
+        ----------
+        pages: string | int | iterable of int, optional `None`
+            If given, only these pages, see `fusus.lib.parseNums`.
+
+        Returns
+        -------
+        list of tuple
+            A tuple per line: page, stripe, block, line, and the text of the line:
+            its words, each followed by its punctuation, separated by spaces.
+        """
+
+        # SQLite does not guarantee the order in which group_concat
+        # sees the rows, so we join the words of a line ourselves,
+        # in the order in which they have been stored
+
+        (condition, params) = pagesCondition(pages)
+        lines = {}
+        for (page, stripe, block, line, letters, punc) in self.select(
+            "select page, stripe, block, line, letters, punc from word"
+            f" where {condition} order by page, rowid",
+            params,
+        ):
+            lines.setdefault((page, stripe, block, line), []).append(letters + punc)
+        return [(*key, " ".join(words)) for (key, words) in lines.items()]
+
+    def confidences(self, level="char", pages=None):
+        """Statistics of the confidence of the OCR results per page.
+
+        Parameters
+        ----------
+        level: string, optional `char`
+            `char` or `word`.
+        pages: string | int | iterable of int, optional `None`
+            If given, only these pages, see `fusus.lib.parseNums`.
+
+        Returns
+        -------
+        list of tuple
+            A tuple per page: page, number of results, minimum, maximum and
+            total of the confidence.
+        """
+
+        (condition, params) = pagesCondition(pages)
+        return self.select(
+            "select page, count(*), min(confidence), max(confidence),"
+            f" sum(confidence) from {level} where {condition}"
+            " group by page order by page",
+            params,
+        )
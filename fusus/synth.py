@@ -0,0 +1,731 @@
+"""Synthetic page images.
+
+The books in this repo are small.
+In order to see how the pipeline behaves on thousands of pages, on pages
+crowded with marks, or on pages with two-column stripes, we generate
+books of synthetic pages.
+
+A synthetic page has
+
+*   an optional header: a page number and a horizontal stroke below it;
+*   a body of lines of text; parts of the body may be split into two blocks
+    by a vertical stroke;
+*   optional footnotes: a short horizontal stroke with a few smaller lines
+    below it;
+*   marks, placed in the gaps between words, in the `high`, `mid` or `low`
+    band of a line;
+*   optional skew-border artifacts: dark, slanted bands at the edges of the page,
+    as you get when a book is scanned slightly askew.
+
+The text is rendered in a font of your choice, with random Arabic letters.
+If no font is given, the words are drawn as shapes that mimic Arabic script:
+a base stroke with ascenders, loops and dots.
+That is enough for layout detection and cleaning, and it does not depend
+on fonts being installed.
+
+`makeBook` writes a book directory as `fusus.book.Book` expects it:
+page images in `in`, mark templates in `marks`.
+Besides that, it writes the ground truth in `truth`: a JSON file per page
+with the positions of the strokes, blocks, lines and marks,
+and a file `book.json` with the settings of the generator.
+`evaluate` compares the outcome of the pipeline on a page with the ground truth.
+
+Everything is driven by a seed.
+Page *n* of a book only depends on the seed and *n*, not on the number of
+pages generated, so a larger book extends a smaller one.
+"""
+
+import os
+import json
+
+import cv2
+import numpy as np
+
+from .lib import DEFAULT_EXTENSION
+
+SYNTH = dict(
+    pageW=1774,
+    pageH=2658,
+    marginX=130,
+    marginY=120,
+    lineHeight=120,
+    wordGap=(30, 60),
+    wordWidth=(60, 240),
+    ink=(10, 60),
+    paper=(225, 250),
+    noise=3,
+    header=0.9,
+    twoColumn=0.3,
+    columnGap=60,
+    footnotes=0.4,
+    footnoteScale=0.7,
+    markDensity=0.15,
+    skew=0.3,
+    font=None,
+    fontSize=64,
+)
+"""Default settings of the generator.
+
+setting | meaning
+--- | ---
+`pageW`, `pageH` | size of a page in pixels
+`marginX`, `marginY` | white space around the page contents
+`lineHeight` | distance between the baselines of consecutive lines
+`wordGap` | minimum and maximum space between words
+`wordWidth` | minimum and maximum width of words (without font)
+`ink` | range of the gray values of ink
+`paper` | range of the gray values of the paper
+`noise` | standard deviation of the noise added to the page
+`header` | probability that a page has a header
+`twoColumn` | probability that a page has a stripe with two blocks
+`columnGap` | space between the two blocks of a stripe
+`footnotes` | probability that a page has footnotes
+`footnoteScale` | size of footnote lines relative to body lines
+`markDensity` | probability that a gap between words gets a mark
+`skew` | probability that a page has skew-border artifacts
+`font` | path to a TrueType font; if `None`, words are drawn as shapes
+`fontSize` | size of the font in pixels
+"""
+
+ARABIC_LETTERS = "ابتثجحخدذرزسشصضطظعغفقكلمنهوي"
+
+MARKS = dict(
+    high=("dots", "stroke"),
+    mid=("comma", "colon"),
+    low=("dot", "dash"),
+)
+"""The synthetic marks, per band."""
+
+
+def drawMark(name):
+    """Draws a synthetic mark.
+
+    Parameters
+    ----------
+    name: string
+        One of the names in `MARKS`.
+
+    Returns
+    -------
+    image as np array
+        A grayscale image: black ink on white.
+    """
+
+    img = np.full((24, 24), 255, dtype=np.uint8)
+
+    if name == "dots":
+        cv2.circle(img, (7, 12), 4, 0, -1)
+        cv2.circle(img, (17, 12), 4, 0, -1)
+    elif name == "stroke":
+        cv2.line(img, (5, 17), (19, 7), 0, 4)
+    elif name == "comma":
+        cv2.ellipse(img, (12, 10), (6, 8), 0, 90, 300, 0, 4)
+        cv2.circle(img, (14, 5), 3, 0, -1)
+    elif name == "colon":
+        cv2.circle(img, (12, 5), 4, 0, -1)
+        cv2.circle(img, (12, 18), 4, 0, -1)
+    elif name == "dot":
+        cv2.circle(img, (12, 12), 5, 0, -1)
+    elif name == "dash":
+        cv2.rectangle(img, (3, 10), (20, 14), 0, -1)
+
+    pts = cv2.findNonZero(255 - img)
+    (x, y, w, h) = cv2.boundingRect(pts)
+    return img[y : y + h, x : x + w]
+
+
+class Canvas:
+    def __init__(self, spec, rng):
+        """A page under construction.
+
+        Parameters
+        ----------
+        spec: dict
+            The settings of the generator, see `SYNTH`.
+        rng: np.random.Generator
+            The source of randomness for this page.
+        """
+
+        self.spec = spec
+        self.rng = rng
+        self.img = np.full((spec["pageH"], spec["pageW"]), 255, dtype=np.uint8)
+        self.font = None
+        self.fontCache = {}
+
+        if spec["font"] is not None:
+            from PIL import ImageFont, features
+
+            self.font = spec["font"]
+            self.rtl = features.check("raqm")
+            self.ImageFont = ImageFont
+
+    def inkColor(self):
+        (lo, hi) = self.spec["ink"]
+        return int(self.rng.integers(lo, hi + 1))
+
+    def word(self, right, baseline, size, maxWidth):
+        """Draws a word with its right edge at a given position.
+
+        Parameters
+        ----------
+        right: int
+            The x coordinate of the right edge of the word.
+        baseline: int
+            The y coordinate of the base line.
+        size: float
+            Scale of the word relative to a body line.
+        maxWidth: int
+            The word may not be wider than this.
+
+        Returns
+        -------
+        tuple | None
+            The bounding box (left, top, right, bottom) of the ink of the word,
+            or `None` if no word fits.
+        """
+
+        if self.font is not None:
+            return self._fontWord(right, baseline, size, maxWidth)
+
+        spec = self.spec
+        rng = self.rng
+        img = self.img
+        unit = spec["lineHeight"] * size
+        (wMin, wMax) = spec["wordWidth"]
+        width = int(rng.integers(int(wMin * size), int(wMax * size) + 1))
+        width = min(width, maxWidth)
+        if width < wMin * size / 2:
+            return None
+
+        left = right - width
+        color = self.inkColor()
+        thick = max(2, int(round(unit / 20)))
+
+        # a word is a series of connected letter groups
+
+        x = right
+        while x > left + thick:
+            groupLeft = max(left, x - int(unit * rng.uniform(0.15, 0.5)))
+            groupBase = baseline + int(rng.integers(-2, 3))
+            cv2.line(img, (groupLeft, groupBase), (x, groupBase), color, thick)
+            self._letters(x, groupLeft, groupBase, unit, thick, color)
+            x = groupLeft - int(unit * rng.uniform(0.2, 0.35))
+
+        top = baseline - int(unit * 0.45) - thick
+        bottom = baseline + int(unit * 0.25) + thick
+        return (left, top, right, bottom)
+
+    def _letters(self, right, left, baseline, unit, thick, color):
+        rng = self.rng
+        img = self.img
+
+        x = right - thick
+        while x > left + thick:
+            kind = rng.integers(0, 4)
+            if kind == 0:
+                height = int(unit * rng.uniform(0.25, 0.45))
+                cv2.line(img, (x, baseline), (x, baseline - height), color, thick)
+            elif kind == 1:
+                r = int(unit * rng.uniform(0.05, 0.09))
+                cv2.circle(img, (x - r, baseline - r), r, color, thick)
+            elif kind == 2:
+                r = max(2, int(unit * 0.03))
+                dy = int(unit * rng.uniform(0.15, 0.25)) * (
+                    1 if rng.integers(0, 2) else -1
+                )
+                cv2.circle(img, (x, baseline - dy), r, color, -1)
+            else:
+                depth = int(unit * rng.uniform(0.08, 0.14))
+                end = (x - depth, baseline + depth)
+                cv2.line(img, (x, baseline), end, color, thick)
+            x -= int(unit * rng.uniform(0.12, 0.25))
+
+    def _fontWord(self, right, baseline, size, maxWidth):
+        spec = self.spec
+        rng = self.rng
+        fontSize = int(spec["fontSize"] * size)
+        font = self.fontCache.get(fontSize, None)
+        if font is None:
+            font = self.ImageFont.truetype(self.font, fontSize)
+            self.fontCache[fontSize] = font
+
+        n = int(rng.integers(2, 7))
+        text = "".join(rng.choice(list(ARABIC_LETTERS), size=n))
+
+        from PIL import Image, ImageDraw
+
+        canvasW = fontSize * (n + 2)
+        canvasH = fontSize * 3
+        im = Image.new("L", (canvasW, canvasH), 255)
+        draw = ImageDraw.Draw(im)
+        origin = (fontSize, fontSize)
+        if self.rtl:
+            draw.text(origin, text, font=font, fill=0, direction="rtl", anchor="ls")
+        else:
+            draw.text(origin, text[::-1], font=font, fill=0, anchor="ls")
+
+        glyphs = np.asarray(im)
+        pts = cv2.findNonZero(255 - glyphs)
+        if pts is None:
+            return None
+        (x, y, w, h) = cv2.boundingRect(pts)
+        if w > maxWidth:
+            return None
+
+        left = right - w
+        top = baseline - (origin[1] - y)
+        img = self.img
+        (pageH, pageW) = img.shape
+        if top < 0 or top + h > pageH or left < 0:
+            return None
+
+        color = self.inkColor()
+        word = glyphs[y : y + h, x : x + w]
+        word = (255 - (255 - word.astype(np.int32)) * (255 - color) // 255).astype(
+            np.uint8
+        )
+        dest = img[top : top + h, left:right]
+        np.minimum(dest, word, out=dest)
+        return (left, top, right, top + h)
+
+    def paste(self, mark, left, top):
+        """Pastes a mark at a position."""
+
+        (h, w) = mark.shape
+        dest = self.img[top : top + h, left : left + w]
+        np.minimum(dest, mark, out=dest)
+        return (left, top, left + w, top + h)
+
+    def line(self, left, right, baseline, size, marks, markImages):
+        """Fills a line with words and marks, from right to left.
+
+        Returns
+        -------
+        tuple
+            The vertical extent (top, bottom) of the line,
+            and the list of marks placed in the line.
+        """
+
+        spec = self.spec
+        rng = self.rng
+        (gapMin, gapMax) = spec["wordGap"]
+        unit = spec["lineHeight"] * size
+
+        placed = []
+        top = None
+        bottom = None
+        x = right
+
+        while x > left:
+            box = self.word(x, baseline, size, x - left)
+            if box is None:
+                break
+            (wl, wt, wr, wb) = box
+            top = wt if top is None else min(top, wt)
+            bottom = wb if bottom is None else max(bottom, wb)
+
+            gap = int(rng.integers(int(gapMin * size), int(gapMax * size) + 1))
+            x = wl - gap
+
+            if marks and rng.random() < spec["markDensity"]:
+                band = rng.choice(list(MARKS))
+                name = rng.choice(MARKS[band])
+                mark = markImages[name]
+                (mh, mw) = mark.shape
+                pad = int(gapMax * size)
+                if x - mw - pad <= left:
+                    break
+                if band == "high":
+                    mTop = baseline - int(unit * 0.45) + int(unit * 0.05)
+                elif band == "mid":
+                    mTop = baseline - mh
+                else:
+                    mTop = baseline + int(unit * 0.1)
+                mBox = self.paste(mark, x - pad - mw, mTop)
+                placed.append(dict(band=str(band), mark=str(name), box=mBox))
+                x = mBox[0] - pad
+
+        return ((top, bottom), placed)
+
+    def hStroke(self, left, right, y):
+        """Draws a horizontal separator stroke."""
+
+        thick = int(self.rng.integers(3, 6))
+        top = y - thick // 2
+        cv2.rectangle(self.img, (left, top), (right, top + thick - 1), 0, -1)
+        return (left, top, right, top + thick - 1)
+
+    def vStroke(self, x, top, bottom):
+        """Draws a vertical separator stroke."""
+
+        thick = int(self.rng.integers(3, 6))
+        left = x - thick // 2
+        cv2.rectangle(self.img, (left, top), (left + thick - 1, bottom), 0, -1)
+        return (left, top, left + thick - 1, bottom)
+
+    def skewBorders(self):
+        """Draws dark, slanted bands at some edges of the page."""
+
+        rng = self.rng
+        img = self.img
+        (pageH, pageW) = img.shape
+        borders = []
+
+        for edge in ("left", "right", "top", "bottom"):
+            if rng.random() < 0.5:
+                continue
+            color = int(rng.integers(0, 60))
+            w1 = int(rng.integers(5, 60))
+            w2 = int(rng.integers(5, 60))
+            if edge == "left":
+                poly = [(0, 0), (w1, 0), (w2, pageH - 1), (0, pageH - 1)]
+            elif edge == "right":
+                poly = [
+                    (pageW - 1, 0),
+                    (pageW - 1 - w1, 0),
+                    (pageW - 1 - w2, pageH - 1),
+                    (pageW - 1, pageH - 1),
+                ]
+            elif edge == "top":
+                poly = [(0, 0), (0, w1), (pageW - 1, w2), (pageW - 1, 0)]
+            else:
+                poly = [
+                    (0, pageH - 1),
+                    (0, pageH - 1 - w1),
+                    (pageW - 1, pageH - 1 - w2),
+                    (pageW - 1, pageH - 1),
+                ]
+            cv2.fillPoly(img, [np.array(poly, dtype=np.int32)], color)
+            borders.append(dict(edge=edge, widths=(w1, w2)))
+
+        return borders
+
+    def finish(self):
+        """Applies paper tone and noise.
+
+        Returns
+        -------
+        image as np array
+        """
+
+        spec = self.spec
+        rng = self.rng
+        (lo, hi) = spec["paper"]
+        paper = int(rng.integers(lo, hi + 1))
+        img = self.img.astype(np.float32) * (paper / 255)
+        if spec["noise"]:
+            img += rng.normal(0, spec["noise"], img.shape).astype(np.float32)
+        return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def makePage(pageNum, seed=0, markImages=None, **settings):
+    """Generates a synthetic page.
+
+    Parameters
+    ----------
+    pageNum: int
+        The number of the page.
+    seed: int, optional 0
+        Together with the page number it determines the page completely.
+    markImages: dict, optional `None`
+        The images of the marks, keyed by name.
+        If `None`, they are drawn by `drawMark`.
+    settings: dict, optional
+        Overrides of the settings in `SYNTH`.
+
+    Returns
+    -------
+    tuple
+        The page image (grayscale) and the ground truth as a dict.
+    """
+
+    spec = {k: settings.get(k, v) for (k, v) in SYNTH.items()}
+    rng = np.random.default_rng((seed, pageNum))
+    if markImages is None:
+        markImages = {
+            name: drawMark(name) for names in MARKS.values() for name in names
+        }
+
+    canvas = Canvas(spec, rng)
+    pageW = spec["pageW"]
+    pageH = spec["pageH"]
+    marginX = spec["marginX"]
+    marginY = spec["marginY"]
+    lineHeight = spec["lineHeight"]
+    left = marginX
+    right = pageW - marginX
+
+    truth = dict(
+        page=pageNum,
+        width=pageW,
+        height=pageH,
+        header=None,
+        strokes=[],
+        blocks=[],
+        footnotes=None,
+        marks=[],
+        borders=[],
+    )
+    strokes = truth["strokes"]
+    blocks = truth["blocks"]
+    marks = truth["marks"]
+
+    y = marginY
+
+    if rng.random() < spec["header"]:
+        size = spec["footnoteScale"]
+        baseline = y + int(lineHeight * size * 0.6)
+        middle = pageW // 2
+        box = canvas.word(middle + 40, baseline, size, 80)
+        y = baseline + int(lineHeight * size * 0.5)
+        stroke = canvas.hStroke(left, right, y)
+        strokes.append(dict(kind="h", role="header", box=stroke))
+        truth["header"] = box
+        y = stroke[3] + lineHeight // 2
+
+    hasFootnotes = rng.random() < spec["footnotes"]
+    nFootLines = int(rng.integers(2, 5)) if hasFootnotes else 0
+    footHeight = (
+        int(nFootLines * lineHeight * spec["footnoteScale"]) + lineHeight
+        if hasFootnotes
+        else 0
+    )
+    bodyBottom = pageH - marginY - footHeight
+    nLines = max(1, (bodyBottom - y) // lineHeight)
+
+    # the body: stripes of one or two blocks
+
+    stripes = []
+    if nLines >= 6 and rng.random() < spec["twoColumn"]:
+        first = int(rng.integers(0, nLines // 2))
+        n = int(rng.integers(4, nLines - first + 1))
+        if first:
+            stripes.append((first, False))
+        stripes.append((n, True))
+        if nLines - first - n:
+            stripes.append((nLines - first - n, False))
+    else:
+        stripes.append((nLines, False))
+
+    for (stripe, (n, split)) in enumerate(stripes):
+        top = y
+        bottom = y + n * lineHeight
+        if split:
+            gap = spec["columnGap"]
+            middle = (left + right) // 2
+            stroke = canvas.vStroke(middle, top, bottom - lineHeight // 4)
+            strokes.append(dict(kind="v", role="block", box=stroke))
+            parts = (("r", middle + gap // 2, right), ("l", left, middle - gap // 2))
+        else:
+            parts = (("", left, right),)
+
+        for (block, bLeft, bRight) in parts:
+            lines = []
+            for i in range(n):
+                baseline = top + i * lineHeight + int(lineHeight * 0.65)
+                ((lTop, lBottom), placed) = canvas.line(
+                    bLeft, bRight, baseline, 1.0, True, markImages
+                )
+                if lTop is None:
+                    continue
+                lines.append((lTop, lBottom))
+                marks.extend(placed)
+            blocks.append(
+                dict(
+                    stripe=stripe,
+                    block=block,
+                    box=(bLeft, top, bRight, bottom),
+                    lines=lines,
+                )
+            )
+        y = bottom
+
+    if hasFootnotes:
+        size = spec["footnoteScale"]
+        y += lineHeight // 2
+        stroke = canvas.hStroke(right - (right - left) // 3, right, y)
+        strokes.append(dict(kind="h", role="footnote", box=stroke))
+        y = stroke[3] + lineHeight // 4
+        footLines = []
+        for i in range(nFootLines):
+            baseline = y + int(lineHeight * size * (i + 0.7))
+            ((lTop, lBottom), placed) = canvas.line(
+                left, right, baseline, size, False, markImages
+            )
+            if lTop is not None:
+                footLines.append((lTop, lBottom))
+        truth["footnotes"] = footLines
+
+    if rng.random() < spec["skew"]:
+        truth["borders"] = canvas.skewBorders()
+
+    return (canvas.finish(), truth)
+
+
+def makeBook(bookDir, pages=10, seed=0, **settings):
+    """Generates a book of synthetic pages.
+
+    Parameters
+    ----------
+    bookDir: string
+        The directory of the book. Will be created if it does not exist.
+        Existing files will be overwritten.
+    pages: int | iterable of int, optional 10
+        The number of pages, or the page numbers of the pages to generate.
+    seed: int, optional 0
+        The seed of the generator.
+    settings: dict, optional
+        Overrides of the settings in `SYNTH`.
+
+    Returns
+    -------
+    list
+        The file names of the pages that have been generated.
+    """
+
+    bookDir = os.path.expanduser(bookDir)
+    pageNums = range(1, pages + 1) if type(pages) is int else pages
+
+    inDir = f"{bookDir}/in"
+    marksDir = f"{bookDir}/marks"
+    truthDir = f"{bookDir}/truth"
+
+    for d in (inDir, truthDir):
+        os.makedirs(d, exist_ok=True)
+
+    markImages = {}
+    for (band, names) in MARKS.items():
+        os.makedirs(f"{marksDir}/{band}", exist_ok=True)
+        for name in names:
+            mark = drawMark(name)
+            markImages[name] = mark
+            cv2.imwrite(f"{marksDir}/{band}/{name}.{DEFAULT_EXTENSION}", mark)
+
+    spec = {k: settings.get(k, v) for (k, v) in SYNTH.items()}
+    with open(f"{truthDir}/book.json", "w") as fh:
+        json.dump(dict(seed=seed, settings=spec, marks=MARKS), fh, indent=1)
+
+    digits = max(3, len(str(max(pageNums, default=0))))
+    files = []
+
+    for pageNum in pageNums:
+        (img, truth) = makePage(pageNum, seed=seed, markImages=markImages, **settings)
+        bare = f"{pageNum:0{digits}d}"
+        f = f"{bare}.{DEFAULT_EXTENSION}"
+        cv2.imwrite(f"{inDir}/{f}", img)
+        with open(f"{truthDir}/{bare}.json", "w") as fh:
+            json.dump(truth, fh)
+        files.append(f)
+
+    return files
+
+
+def readTruth(bookDir, bare):
+    """Reads the ground truth of a synthetic page.
+
+    Parameters
+    ----------
+    bookDir: string
+        The directory of the book.
+    bare: string
+        The file name of the page without extension.
+
+    Returns
+    -------
+    dict | None
+        `None` if there is no ground truth for this page.
+    """
+
+    path = f"{os.path.expanduser(bookDir)}/truth/{bare}.json"
+    if not os.path.exists(path):
+        return None
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def overlap(a, b):
+    """The intersection over union of two boxes (left, top, right, bottom)."""
+
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0
+    inter = w * h
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union
+
+
+def evaluate(page, truth, minOverlap=0.5):
+    """Compares the outcome of the pipeline on a page with the ground truth.
+
+    Parameters
+    ----------
+    page: object
+        A `fusus.page.Page` that has gone through layout and cleaning.
+    truth: dict
+        The ground truth of the page, see `readTruth`.
+    minOverlap: float, optional 0.5
+        The minimal intersection over union for a block to match a true block.
+
+    Returns
+    -------
+    dict
+        Counts of true, detected and matched blocks and lines,
+        and of true and wiped marks.
+        A line matches if its vertical extent overlaps with that of
+        a true line in a matching block.
+        A mark counts as wiped if it is inside a detected block and its ink
+        is gone from the *clean* image.
+    """
+
+    result = dict(
+        blocks=len(truth["blocks"]),
+        blocksFound=0,
+        blocksMatched=0,
+        lines=sum(len(b["lines"]) for b in truth["blocks"]),
+        linesFound=0,
+        linesMatched=0,
+        marks=len(truth["marks"]),
+        marksInBlocks=0,
+        marksWiped=0,
+    )
+
+    found = getattr(page, "blocks", None) or {}
+    result["blocksFound"] = len(found)
+
+    for data in found.values():
+        box = data["inner"]
+        lines = data.get("bands", {}).get("main", {}).get("lines", [])
+        result["linesFound"] += len(lines)
+
+        trueBlock = max(
+            truth["blocks"], key=lambda b: overlap(box, b["box"]), default=None
+        )
+        if trueBlock is None or overlap(box, trueBlock["box"]) < minOverlap:
+            continue
+        result["blocksMatched"] += 1
+
+        top = box[1]
+        trueLines = list(trueBlock["lines"])
+        for (up, lo) in lines:
+            (up, lo) = (up + top, lo + top)
+            for (i, (tUp, tLo)) in enumerate(trueLines):
+                if min(lo, tLo) - max(up, tUp) > (tLo - tUp) / 2:
+                    result["linesMatched"] += 1
+                    del trueLines[i]
+                    break
+
+    # only marks inside detected blocks can be wiped;
+    # outside the blocks everything is wiped
+
+    clean = page.stages.get("clean", None)
+    for mark in truth["marks"]:
+        box = mark["box"]
+        if not any(overlap(box, data["inner"]) > 0 for data in found.values()):
+            continue
+        result["marksInBlocks"] += 1
+        (left, top, right, bottom) = box
+        if clean is not None and clean[top:bottom, left:right].min() > 127:
+            result["marksWiped"] += 1
+
+    return result
@@ -0,0 +1,80 @@
+"""Compiled templates for HTML output.
+
+HTML output is generated from templates with named slots, written as `«name»`.
+
+A template is split into literal segments and slots once, when it is compiled.
+Filling it in is a single pass over the segments: we do not copy the whole
+template text for every slot, as a chain of `str.replace` calls would do.
+
+Slot values can also be iterables of strings.
+When a template is written to a file, such values are streamed piece by piece,
+so that a document body need not be assembled in memory first.
+"""
+
+import re
+
+SLOT_RE = re.compile(r"«([A-Za-z0-9_]+)»")
+
+
+class Template:
+    def __init__(self, text):
+        """Compiles a template.
+
+        Parameters
+        ----------
+        text: string
+            The template text, with slots written as `«name»`.
+        """
+
+        parts = SLOT_RE.split(text)
+        self.literals = tuple(parts[0::2])
+        self.slots = tuple(parts[1::2])
+
+    def _pieces(self, values):
+        literals = self.literals
+
+        for (i, slot) in enumerate(self.slots):
+            yield literals[i]
+            value = values[slot]
+            if type(value) is str:
+                yield value
+            elif type(value) in {int, float}:
+                yield str(value)
+            else:
+                yield from value
+        yield literals[-1]
+
+    def render(self, **values):
+        """Fills in the template.
+
+        Parameters
+        ----------
+        values: dict
+            The values for the slots, keyed by slot name.
+            A value is a string, a number, or an iterable of strings.
+
+        Returns
+        -------
+        string
+            The filled in template.
+        """
+
+        return "".join(self._pieces(values))
+
+    def write(self, fh, **values):
+        """Fills in the template and writes it to a file.
+
+        Parameters
+        ----------
+        fh: file handle
+            Open for writing text.
+        values: dict
+            As in `Template.render`.
+            Iterable values are written to the file as they are produced.
+
+        Returns
+        -------
+        None
+        """
+
+        fh.writelines(self._pieces(values))
@@ -0,0 +1,162 @@
+"""Background work during batch processing.
+
+While a page is being processed, the results of the previous page can be
+written to disk by other threads.
+Encoding an image as PNG and writing it takes a considerable amount of time,
+and most of it is spent in code that releases the Python interpreter lock,
+so it can proceed in parallel with the processing of the next page.
+
+`Writer` is a small pool of threads with a bounded number of pending
+tasks: when the pool falls behind, the pipeline waits before it submits
+more work. In that way the memory held by unwritten images stays bounded.
+
+Likewise, the scans of the next pages can be read and decoded while the
+current page is being processed, so that disk latency and decoding are
+no longer on the critical path. `Prefetcher` does that for a fixed number
+of pages ahead.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+class Writer:
+    def __init__(self, workers=2, pending=8):
+        """Writes files in background threads.
+
+        Parameters
+        ----------
+        workers: int, optional 2
+            The number of threads that do the writing.
+        pending: int, optional 8
+            The maximum number of tasks that have been submitted but not yet
+            completed. When this number is reached, `Writer.submit` waits until
+            a task completes.
+        """
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="fusus-writer"
+        )
+        self.slots = threading.BoundedSemaphore(pending)
+        self.lock = threading.Lock()
+        self.futures = set()
+        self.errors = []
+
+    def submit(self, func, *args, **kwargs):
+        """Submits a writing task.
+
+        Blocks if there are too many pending tasks.
+
+        Parameters
+        ----------
+        func: function
+            The function that performs the task.
+        args, kwargs: optional
+            The arguments of the function.
+            They should not be modified by the caller after submission.
+        """
+
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(func, *args, **kwargs)
+        except Exception:
+            self.slots.release()
+            raise
+
+        with self.lock:
+            self.futures.add(future)
+        future.add_done_callback(self._done)
+
+    def _done(self, future):
+        exc = future.exception()
+        with self.lock:
+            self.futures.discard(future)
+            if exc is not None:
+                self.errors.append(exc)
+        self.slots.release()
+
+    def flush(self):
+        """Waits until all submitted tasks have completed.
+
+        Returns
+        -------
+        list of Exception
+            The errors raised by the tasks that completed since the previous
+            flush.
+        """
+
+        with self.lock:
+            futures = list(self.futures)
+        wait(futures)
+
+        with self.lock:
+            errors = self.errors
+            self.errors = []
+        return errors
+
+    def close(self):
+        """Waits for all tasks and stops the threads.
+
+        Returns
+        -------
+        list of Exception
+            As in `Writer.flush`.
+        """
+
+        errors = self.flush()
+        self.executor.shutdown(wait=True)
+        return errors
+
+
+class Prefetcher:
+    def __init__(self, func, items, ahead=2):
+        """Computes results for a sequence of items ahead of their use.
+
+        Use it as an iterator: it yields the items in order, each with its result.
+        While an item is being handled, the results for the next items are
+        computed in background threads.
+
+        Parameters
+        ----------
+        func: function
+            The function that computes the result for an item.
+        items: iterable
+            The items.
+        ahead: int, optional 2
+            The number of items whose results are computed ahead.
+            This also bounds the number of results that are held in memory.
+        """
+
+        self.func = func
+        self.items = list(items)
+        self.ahead = ahead
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(1, ahead), thread_name_prefix="fusus-prefetch"
+        )
+        self.futures = {}
+        self.submitted = 0
+
+    def __iter__(self):
+        func = self.func
+        items = self.items
+        nItems = len(items)
+        futures = self.futures
+        executor = self.executor
+
+        try:
+            for (i, item) in enumerate(items):
+                while self.submitted < min(nItems, i + 1 + self.ahead):
+                    j = self.submitted
+                    futures[j] = executor.submit(func, items[j])
+                    self.submitted += 1
+                yield (item, futures.pop(i).result())
+        finally:
+            self.close()
+
+    def close(self):
+        """Cancels the pending computations and stops the threads."""
+
+        for future in self.futures.values():
+            future.cancel()
+        self.futures.clear()
+        self.executor.shutdown(wait=True)
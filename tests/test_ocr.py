@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+import fusus.ocr
+from fusus.book import Book
+from fusus.synth import makeBook
+
+
+PAGES = 3
+
+
+def standInRpred(model, roi, bounds, **kwargs):
+    """Recognizes the same few characters on every line, from right to left."""
+
+    width = bounds["boxes"][0][2]
+    height = bounds["boxes"][0][3]
+    yield [
+        (c, (width - 10 * (i + 1), 0, width - 10 * i, height), 0.9)
+        for (i, c) in enumerate("اب ت.ث")
+    ]
+
+
+@pytest.fixture
+def ocrBook(tmp_path, monkeypatch):
+    monkeypatch.setattr(fusus.ocr, "rpred", standInRpred)
+    monkeypatch.setattr(fusus.ocr.OCR, "ensureLoaded", lambda self: None)
+    monkeypatch.chdir(tmp_path)
+    makeBook(str(tmp_path), pages=PAGES, seed=0)
+    return Book(cd=str(tmp_path))
+
+
+def test_process(ocrBook):
+    B = ocrBook
+    page = B.process(doOcr=True)
+
+    assert page.stages["word"]
+    for f in B.allPages:
+        bare = os.path.splitext(f)[0]
+        for stage in ("word", "char", "line", "proofchar", "proofword"):
+            (sDir, sTrail, sExt) = B.stageDir(stage)
+            assert os.path.exists(f"{sDir}/{bare}{sTrail}.{sExt}"), (f, stage)
+
+        # the quality summary must not look stale to Page.quality
+        (sDir, sTrail, sExt) = B.stageDir("quality")
+        qTime = os.path.getmtime(f"{sDir}/{bare}{sTrail}.{sExt}")
+        for stage in ("word", "char"):
+            (sDir, sTrail, sExt) = B.stageDir(stage)
+            assert qTime >= os.path.getmtime(f"{sDir}/{bare}{sTrail}.{sExt}")
+
+
+def test_store(ocrBook):
+    B = ocrBook
+    B.configure(database=True)
+    B.process(doOcr=True)
+
+    S = B.store()
+    try:
+        assert S.pages() == list(range(1, PAGES + 1))
+        for level in ("char", "word", "line"):
+            types = S.select(
+                "select distinct typeof(stripe), typeof(line), typeof(left),"
+                f" typeof(top), typeof(right), typeof(bottom) from {level}"
+            )
+            assert types == [("integer",) * 6], level
+    finally:
+        S.close()
+
+
+def test_minimal(ocrBook):
+    B = ocrBook
+    B.process(doOcr=True, output="minimal")
+
+    assert len(os.listdir(B.C.outDir)) == PAGES
+    assert sorted(os.listdir(B.C.interDir)) == ["manifest.json"]
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from fusus.book import Book
+from fusus.synth import makeBook, readTruth, evaluate
+from fusus.bench import compare
+
+
+@pytest.fixture
+def synthPage(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    makeBook(str(tmp_path), pages=1, seed=0)
+    B = Book(cd=str(tmp_path))
+    (f,) = B.allPages
+    page = B._doPage(f, batch=True, quiet=True, doOcr=False)
+    return (page, readTruth(str(tmp_path), f.rsplit(".", 1)[0]))
+
+
+def test_evaluate(synthPage):
+    (page, truth) = synthPage
+    result = evaluate(page, truth)
+
+    assert result["blocks"] > 0
+    assert result["blocksMatched"] > 0
+    assert result["lines"] > 0
+    assert result["linesMatched"] > result["lines"] / 2
+    assert result["marksInBlocks"] > 0
+    assert result["marksWiped"] > 0
+
+
+def writeResults(path, walls):
+    meta = dict(platform="p", machine="m", processor="x", cpus=1, versions={})
+    results = {
+        name: dict(wall=wall, opsPerSecond=1) for (name, wall) in walls.items()
+    }
+    with open(path, "w") as fh:
+        json.dump(dict(meta=meta, results=results), fh)
+    return str(path)
+
+
+def test_compare(tmp_path):
+    old = writeResults(tmp_path / "old.json", dict(a=1.0, b=1.0))
+    same = writeResults(tmp_path / "same.json", dict(a=1.05, b=0.5))
+    slow = writeResults(tmp_path / "slow.json", dict(a=1.0, b=1.5))
+
+    assert compare(old, same, tolerance=0.1)
+    assert not compare(old, slow, tolerance=0.1)
+    assert compare(old, slow, tolerance=0.6)